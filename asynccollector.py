@@ -0,0 +1,333 @@
+#asyncio engine for collector.py, crawls many channels on one event loop instead of one requests.Session call at a time
+#needs aiohttp (pip install aiohttp), the default requests engine doesn't
+import asyncio
+import json
+import re
+from contextlib import aclosing
+from http import HTTPStatus
+from time import perf_counter
+
+from collector import loadJson, parseRetryAfter, retryDelay, isCaptchaUrl, isConsentUrl, _RetryStatuses, _ThrottleStatuses
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+#statuses of a browse request whose client context YouTube no longer accepts
+_RejectedContextStatuses = {HTTPStatus.BAD_REQUEST, HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN}
+#pages fetched ahead of the diff before fetching waits for it
+_PagesAhead = 2
+_ContinuationTokenPattern = re.compile(
+    rb'"continuationCommand"\s*:\s*\{\s*"token"\s*:\s*"([^"]+)"')
+
+
+def findContinuationToken(page: bytes):
+    """
+        Cheap scan for the next page's token in a raw browse response, without parsing the JSON
+        The continuation item is the last one on a page, so the last match is the one we want
+    """
+    position = page.rfind(b'"continuationCommand"')
+    if position == -1:
+        return None
+    match = _ContinuationTokenPattern.match(page, position)
+    return match.group(1).decode() if match else None
+
+
+class AsyncCollector:
+    """
+        Runs getVideos and whole channel crawls for a Collector on a single event loop
+        Page parsing is shared with the Collector, only the transport is different
+    """
+
+    def __init__(self, collector, concurrency: int = None):
+        if aiohttp is None:
+            raise ImportError(
+                "The async engine needs aiohttp, install it with 'pip install aiohttp'")
+        self.collector = collector
+        self.concurrency = concurrency or collector.workers
+        self.session = None
+
+    async def request(self, method: str, url: str, **kwargs):
+        """
+            Same rate limit, retries and consenting again as Collector.request, returns the status and body of the last response
+        """
+        collector = self.collector
+        consentGeneration = collector._consentGeneration
+        status, content, responseUrl = await self.requestWithRetries(method, url, **kwargs)
+        if isConsentUrl(responseUrl):
+            #consent through the requests session and hand its new cookies to this one
+            await asyncio.to_thread(collector.consentAgain, consentGeneration)
+            self.session.cookie_jar.update_cookies(collector.session.cookies.get_dict())
+            status, content, _ = await self.requestWithRetries(method, url, **kwargs)
+        return status, content
+
+    async def requestWithRetries(self, method: str, url: str, **kwargs):
+        """
+            Collector.requestWithRetries on aiohttp, returns the status, body and url of the last response
+        """
+        collector = self.collector
+        rateLimiter = collector.rateLimiter
+        metrics = collector.metrics
+        for attempt in range(collector.retries + 1):
+            delay = rateLimiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            start = perf_counter()
+            try:
+                async with self.session.request(method, url, **kwargs) as response:
+                    throttled = response.status in _ThrottleStatuses or isCaptchaUrl(response.url)
+                    if attempt == collector.retries or (not throttled and response.status not in _RetryStatuses):
+                        if not throttled and response.status not in _RetryStatuses:
+                            rateLimiter.succeeded()
+                        content = await response.read()
+                        metrics.countRequest(url, perf_counter() - start)
+                        metrics.add("bytes", len(content))
+                        return response.status, content, str(response.url)
+                    metrics.countRequest(url, perf_counter() - start)
+                    retryAfter = parseRetryAfter(response.headers.get("Retry-After"))
+                    if throttled:
+                        metrics.add("throttled")
+                        rateLimiter.throttled(retryAfter)
+                    reason, delay = f"status {response.status} from {response.url}", retryDelay(attempt, retryAfter)
+            except aiohttp.ClientConnectionError as e:
+                metrics.countRequest(url, perf_counter() - start)
+                if attempt == collector.retries:
+                    raise
+                reason, delay = e, retryDelay(attempt)
+            collector.print(
+                2, f"Request to {url} failed ({reason}), retry {attempt + 1}/{collector.retries} in {delay:.1f}s")
+            metrics.add("retries")
+            await asyncio.sleep(delay)
+
+    async def browse(self, innertubeContext: tuple, channelID: str = None, continuationToken: str = None):
+        """
+            Status and body of a youtubei/v1/browse request, see Collector.browseArguments
+        """
+        return await self.request(
+            "POST", "https://www.youtube.com/youtubei/v1/browse", **self.collector.browseArguments(innertubeContext, channelID, continuationToken))
+
+    async def browseFirstVideoPage(self, channelID: str, innertubeContext: tuple):
+        """
+            Collector.browseFirstVideoPage on the event loop, None if YouTube didn't accept the request
+        """
+        collector = self.collector
+        if innertubeContext is None:
+            return None
+        status, page = await self.browse(innertubeContext, channelID)
+        if status != HTTPStatus.OK:
+            collector.print(
+                2, f"Browsing first page of videos failed with status {status}")
+            return None
+        try:
+            with collector.metrics.phase("parse"):
+                return collector.parseVideoGrid(loadJson(page))
+        except Exception as e:
+            collector.print(
+                2, f"Couldn't read first page of videos from browse response ({e})")
+            return None
+
+    async def scrapeVideosPage(self, channelID: str):
+        """
+            Collector.scrapeVideosPage on the event loop, the context it finds replaces the session's one for every later channel
+        """
+        collector = self.collector
+        _, initialPage = await self.request(
+            "GET", f"https://www.youtube.com/channel/{channelID}/videos")
+        try:
+            innertubeContext = collector.buildContinuationRequest(
+                collector.parseInnertubeConfig(initialPage))
+            videoList = collector.parseInitialVideoList(initialPage)
+        except Exception as e:
+            collector.reportSiteFormatError("2", e, "Here is the initial get videos page:\n\n{}".format(
+                initialPage.decode("utf-8", "replace")))
+
+        def storeContext():
+            #the lock might be held by a thread fetching the homepage, wait for it off the event loop
+            with collector._innertubeLock:
+                collector.innertubeContext = innertubeContext
+        await asyncio.to_thread(storeContext)
+        return innertubeContext, videoList
+
+    def parsePage(self, page: bytes):
+        with self.collector.metrics.phase("parse"):
+            return self.collector.parseVideoList(self.collector.parseContinuationPage(page))
+
+    async def iterPages(self, channelID: str, checkpoint=None):
+        """
+            Yield the channel's videos a page at a time like Collector.iterVideos, but pipelined: the next continuation page is
+            requested as soon as its token shows up in the raw response, and the current page is parsed in a thread while that request is in flight
+            Pages are recorded in checkpoint like Collector.iterVideos does
+        """
+        collector = self.collector
+        if checkpoint and checkpoint.pages:
+            collector.print(
+                2, f"Resuming after video list {checkpoint.pages}, {len(checkpoint.videos)} videos were already fetched")
+            yield list(checkpoint.videos)
+            async for pageVideoData in self.iterRemainingPages(channelID, checkpoint.continuationToken,
+                                                               checkpoint.innertubeContext, checkpoint.pages, checkpoint):
+                yield pageVideoData
+            return
+        #first page straight from the browse endpoint, like the requests engine
+        innertubeContext = await asyncio.to_thread(collector.getInnertubeContext)
+        videoList = await self.browseFirstVideoPage(channelID, innertubeContext)
+        if videoList is None and innertubeContext is not None:
+            #the cached context might have gone stale, try once more with a fresh one
+            innertubeContext = await asyncio.to_thread(collector.getInnertubeContext, innertubeContext)
+            videoList = await self.browseFirstVideoPage(channelID, innertubeContext)
+        if videoList is None:
+            collector.print(2, "Falling back to the channel's videos page")
+            innertubeContext, videoList = await self.scrapeVideosPage(channelID)
+        try:
+            videoData, continuationToken = collector.parseVideoList(videoList)
+        except Exception as e:
+            collector.reportSiteFormatError("3.1", e, "Video list:\n\n{}".format(
+                json.dumps(videoList)))
+        collector.print(2, "Gotten tokens")
+        collector.metrics.countPage(channelID, len(videoData))
+        if checkpoint:
+            checkpoint.record(videoData, continuationToken, innertubeContext)
+        yield videoData
+        async for pageVideoData in self.iterRemainingPages(channelID, continuationToken, innertubeContext, 1, checkpoint):
+            yield pageVideoData
+
+    async def iterRemainingPages(self, channelID: str, continuationToken: str, innertubeContext: tuple, current: int, checkpoint=None):
+        """
+            Follow continuation tokens from page number current on, yielding every page's videos
+        """
+        collector = self.collector
+
+        def fetchPage(token: str):
+            return asyncio.ensure_future(self.browse(innertubeContext, continuationToken=token))
+
+        nextPage = None
+        try:
+            while continuationToken:
+                current += 1
+                collector.print(2, f"Getting video list {current}")
+                if nextPage is None:
+                    nextPage = fetchPage(continuationToken)
+                status, page = await nextPage
+                nextPage = None
+                if status in _RejectedContextStatuses:
+                    #client context was rejected, refresh it and retry the page once like Collector.fetchContinuationPage
+                    collector.print(2, "Client context rejected, refreshing it")
+                    innertubeContext = await asyncio.to_thread(
+                        collector.getInnertubeContext, innertubeContext) or innertubeContext
+                    status, page = await self.browse(innertubeContext, continuationToken=continuationToken)
+                #request page N+1 before parsing page N
+                speculativeToken = findContinuationToken(page)
+                nextPage = fetchPage(speculativeToken) if speculativeToken else None
+                try:
+                    pageVideoData, continuationToken = await asyncio.to_thread(self.parsePage, page)
+                except Exception as e:
+                    collector.reportSiteFormatError("3", e, "Here is the video list page:\n\n{}".format(
+                        page.decode("utf-8", "replace")))
+                collector.metrics.countPage(channelID, len(pageVideoData))
+                if checkpoint:
+                    checkpoint.record(pageVideoData, continuationToken, innertubeContext)
+                if nextPage and speculativeToken != continuationToken:
+                    #the raw scan picked the wrong token, throw that request away
+                    nextPage.cancel()
+                    nextPage = None
+                yield pageVideoData
+        finally:
+            #a page requested ahead isn't needed when parsing failed or the consumer stopped early
+            if nextPage:
+                nextPage.cancel()
+        collector.print(2, "No more videos exist")
+
+    async def getVideos(self, channelID: str, checkpoint=None):
+        """
+            Same result as Collector.getVideos, see iterPages
+        """
+        videoData = []
+        async with aclosing(self.iterPages(channelID, checkpoint)) as pages:
+            async for pageVideoData in pages:
+                videoData.extend(pageVideoData)
+        return videoData
+
+    async def detectAndSaveChanges(self, channelName: str, AppendNewData: bool = True):
+        """
+            Collector.detectAndSaveChanges with pages fetched on the event loop and diffed in a thread as they arrive
+            At most _PagesAhead pages wait between the two, so a channel is never held in memory whole
+            and an incremental crawl stops following tokens soon after the diff stops reading
+        """
+        collector = self.collector
+        async with self._slots:
+            collector.print(1, f"Checking {channelName}")
+            #resolved channels are cached, so this rarely touches the network
+            searchResults = await asyncio.to_thread(collector.resolveChannel, channelName)
+            if not searchResults:
+                collector.print(1, "No channel by such name!")
+                return None
+            channelName, channelID = searchResults
+            collector.print(1, f"Found '{channelName}'")
+            stopAfterKnown = 0
+            if collector.incrementalKnownRun and not collector.isFullScanDue(channelID):
+                stopAfterKnown = collector.incrementalKnownRun
+                collector.print(
+                    2, f"Incremental crawl, stopping after {stopAfterKnown} already indexed videos in a row")
+            collector.print(1, "getting new data... be patient")
+            checkpoint = await asyncio.to_thread(collector.openCheckpoint, channelID)
+            loop = asyncio.get_running_loop()
+            pages = asyncio.Queue(_PagesAhead)
+
+            async def feed():
+                #None marks the last page, an exception is handed over to be raised in the diffing thread
+                try:
+                    async with aclosing(self.iterPages(channelID, checkpoint)) as channelPages:
+                        async for pageVideoData in channelPages:
+                            await pages.put(pageVideoData)
+                except Exception as e:
+                    await pages.put(e)
+                else:
+                    await pages.put(None)
+
+            def videos():
+                while True:
+                    page = asyncio.run_coroutine_threadsafe(pages.get(), loop).result()
+                    if page is None:
+                        return
+                    if isinstance(page, Exception):
+                        raise page
+                    yield from page
+
+            feeder = asyncio.create_task(feed())
+            try:
+                #database work is blocking and serialized by the collector, keep it off the event loop
+                await asyncio.to_thread(collector.saveChanges, channelName, channelID, videos(), AppendNewData, stopAfterKnown)
+            finally:
+                feeder.cancel()
+                await asyncio.gather(feeder, return_exceptions=True)
+        checkpoint.discard()
+        return channelID
+
+    async def crawlChannel(self, channelName: str):
+        """
+            Collector.crawlChannel on the event loop, a failing channel is recorded and the others keep going
+        """
+        try:
+            await self.detectAndSaveChanges(channelName)
+        except Exception as e:
+            self.collector.finishChannel(channelName, e)
+        else:
+            self.collector.finishChannel(channelName)
+
+    async def crawlChannels(self, channelNames: list):
+        """
+            Crawl all channels on one event loop, at most self.concurrency at a time, over one keep-alive connection pool
+        """
+        self._slots = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency * 2, keepalive_timeout=60)
+        #carry over the consent cookies of the requests session
+        async with aiohttp.ClientSession(connector=connector, headers={"user-agent": self.collector.userAgent},
+                                         cookies=self.collector.session.cookies.get_dict()) as self.session:
+            return await asyncio.gather(*(self.crawlChannel(channelName) for channelName in channelNames))
+
+
+def crawlChannels(collector, channelNames: list, resume: bool = False):
+    channelNames = collector.startCrawlRun(channelNames, resume)
+    asyncio.run(AsyncCollector(collector).crawlChannels(channelNames))
+    collector.endCrawlRun()
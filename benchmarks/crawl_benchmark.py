@@ -0,0 +1,217 @@
+#measure Collector throughput end to end against benchmarks/fakeyoutube.py instead of youtube.com
+#run from the repository root: python3 benchmarks/crawl_benchmark.py --channels 4 --videos 5000
+#save a run with --save and compare a later one against it with --compare to catch regressions
+import argparse
+import json
+import multiprocessing
+import re
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from os import path
+from time import perf_counter
+
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from collector import Collector
+from fakeyoutube import FakeYouTube, makeServer, channelID
+
+_YouTubeUrlPattern = re.compile(r"^https://(www\.)?youtube\.com")
+#throughput figures where higher is better, the rest of a result is only reported
+_Throughputs = ("requests_per_second", "videos_per_second")
+
+
+class LocalAdapter(HTTPAdapter):
+    """
+        Sends requests for youtube.com to the fake server instead
+    """
+
+    def __init__(self, baseUrl: str, **kwargs):
+        super().__init__(**kwargs)
+        self.baseUrl = baseUrl
+
+    def send(self, request, **kwargs):
+        request.url = _YouTubeUrlPattern.sub(self.baseUrl, request.url, count=1)
+        return super().send(request, **kwargs)
+
+
+def serve(youtube: FakeYouTube, connection):
+    server = makeServer(youtube)
+    connection.send(server.server_port)
+    server.serve_forever()
+
+
+class FakeServer:
+    """
+        fakeyoutube in its own process, so serving pages doesn't compete with the collector for the GIL
+    """
+
+    def __init__(self, **options):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(
+            target=serve, args=(FakeYouTube(**options), sender), daemon=True)
+        self.process.start()
+        self.baseUrl = f"http://127.0.0.1:{receiver.recv()}"
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+
+
+def makeCollector(databaseType: str, databaseLocation: str, baseUrl: str, workers: int):
+    collector = Collector(databaseType, databaseLocation, "benchmark", 0, workers, offline=True)
+    collector.session.mount("https://", LocalAdapter(
+        baseUrl, pool_connections=workers, pool_maxsize=workers))
+    return collector
+
+
+def measure(name: str, function, memory: bool):
+    """
+        Run function once, it returns (requests, videos). Peak memory is Python allocations while it ran
+    """
+    if memory:
+        tracemalloc.start()
+    start = perf_counter()
+    requests, videos = function()
+    elapsed = perf_counter() - start
+    peak = None
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"name": name, "seconds": elapsed, "requests": requests, "videos": videos,
+            "requests_per_second": requests / elapsed, "videos_per_second": videos / elapsed, "peak_kib": peak / 1024 if peak is not None else None}
+
+
+def runBenchmarks(args):
+    channelNames = [f"bench {i}" for i in range(args.channels)]
+    options = {"videos": args.videos, "pageSize": args.page_size,
+               "latency": args.latency, "errorRate": args.error_rate}
+    databaseLocations = {databaseType: tempfile.mkdtemp(prefix=f"benchmark_{databaseType}_")
+                         for databaseType in args.formats}
+    results = []
+    crawled = {}
+    try:
+        server = FakeServer(generation=0, **options)
+        try:
+            collector = makeCollector("json", databaseLocations[args.formats[0]], server.baseUrl, args.workers)
+
+            def getVideos():
+                for channelName in channelNames:
+                    crawled[channelName] = collector.getVideos(channelID(channelName))
+                return collector.metrics.snapshot()["requests_total"], sum(map(len, crawled.values()))
+            results.append(measure("getVideos", getVideos, args.memory))
+            collector.close()
+            for databaseType in args.formats:
+                collector = makeCollector(databaseType, databaseLocations[databaseType], server.baseUrl, args.workers)
+
+                def index():
+                    collector.crawlChannels(channelNames)
+                    stats = collector.metrics.snapshot()
+                    return stats["requests_total"], stats["videos"]
+                results.append(measure(f"index {databaseType}", index, args.memory))
+                collector.close()
+        finally:
+            server.stop()
+        #the next run sees new uploads and changed views
+        server = FakeServer(generation=1, **options)
+        try:
+            for databaseType in args.formats:
+                collector = makeCollector(databaseType, databaseLocations[databaseType], server.baseUrl, args.workers)
+
+                def diff():
+                    collector.crawlChannels(channelNames)
+                    stats = collector.metrics.snapshot()
+                    return stats["requests_total"], stats["videos"]
+                results.append(measure(f"detectAndSaveChanges {databaseType}", diff, args.memory))
+                collector.close()
+        finally:
+            server.stop()
+        #storage backends on their own, with what getVideos crawled
+        videoCount = sum(map(len, crawled.values()))
+        for databaseType in args.formats:
+            storageLocation = tempfile.mkdtemp(prefix=f"benchmark_storage_{databaseType}_")
+            databaseLocations[f"storage {databaseType}"] = storageLocation
+            collector = Collector(databaseType, storageLocation, "benchmark", 0, offline=True)
+            channels = [(channelName, channelID(channelName)) for channelName in channelNames]
+
+            def write():
+                collector.storage.writeChannels(
+                    [(channelName, ID, crawled[channelName]) for channelName, ID in channels])
+                return 0, videoCount
+
+            def read():
+                return 0, sum(len(videos or ()) for videos in collector.storage.readChannels(channels).values())
+            results.append(measure(f"storage write {databaseType}", write, args.memory))
+            results.append(measure(f"storage read {databaseType}", read, args.memory))
+            collector.close()
+    finally:
+        for databaseLocation in databaseLocations.values():
+            shutil.rmtree(databaseLocation, ignore_errors=True)
+    return results
+
+
+def printResults(results: list, baseline: dict = None, threshold: float = 10):
+    """
+        Print a results table, with the change against baseline results when given. Returns the names of regressed benchmarks
+    """
+    regressions = []
+    print(f"{'benchmark':<30} {'seconds':>9} {'requests':>9} {'req/s':>9} {'videos':>9} {'videos/s':>10} {'peak (KiB)':>11}" +
+          (f" {'change':>9}" if baseline else ""))
+    for result in results:
+        peak = f"{result['peak_kib']:.0f}" if result["peak_kib"] is not None else "-"
+        line = (f"{result['name']:<30} {result['seconds']:>9.2f} {result['requests']:>9} {result['requests_per_second']:>9.1f} "
+                f"{result['videos']:>9} {result['videos_per_second']:>10.0f} {peak:>11}")
+        old = baseline.get(result["name"]) if baseline else None
+        if old:
+            #videos/s is the figure every benchmark has
+            change = (result["videos_per_second"] / old["videos_per_second"] - 1) * 100 if old["videos_per_second"] else 0
+            line += f" {change:>+8.1f}%"
+            if any(old[key] and result[key] < old[key] * (1 - threshold / 100) for key in _Throughputs) or \
+                    old["peak_kib"] and result["peak_kib"] and result["peak_kib"] > old["peak_kib"] * (1 + threshold / 100):
+                regressions.append(result["name"])
+                line += " REGRESSED"
+        print(line)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--channels", help="Channels to crawl", type=int, default=4)
+    parser.add_argument(
+        "--videos", help="Videos per channel", type=int, default=5000)
+    parser.add_argument(
+        "--page-size", help="Videos per page", type=int, default=30)
+    parser.add_argument(
+        "--latency", help="Seconds the fake server waits before answering each request", type=float, default=0)
+    parser.add_argument(
+        "--error-rate", help="Share of requests answered with a 429 or 500", type=float, default=0)
+    parser.add_argument(
+        '-w', "--workers", help="Channels crawled concurrently", type=int, default=1)
+    parser.add_argument(
+        '-f', "--formats", help="Database formats to benchmark", nargs='*', choices=["sqlite", "json", "jsonl"], default=["sqlite", "json", "jsonl"])
+    parser.add_argument(
+        "--no-memory", help="Don't trace peak memory, it slows everything down", dest="memory", action='store_false')
+    parser.add_argument(
+        "--save", help="Save the results to this Json file")
+    parser.add_argument(
+        "--compare", help="Results saved by an earlier run to compare against")
+    parser.add_argument(
+        "--threshold", help="Percent of throughput lost or memory gained that counts as a regression", type=float, default=10)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = {result["name"]: result for result in json.load(f)["results"]}
+    results = runBenchmarks(args)
+    regressions = printResults(results, baseline, args.threshold)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({"options": vars(args), "results": results}, f, indent=4)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
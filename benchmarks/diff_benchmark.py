@@ -0,0 +1,118 @@
+#compare the hash-indexed diff engine against the old nested-loop change detection
+#run from the repository root: python3 benchmarks/diff_benchmark.py
+import argparse
+import copy
+import random
+import sys
+from os import path
+from time import perf_counter
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from collector import diffVideoData, mergeVideoChanges
+
+
+def makeVideos(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    videos = []
+    for i in range(count):
+        videoID = "".join(rng.choice(alphabet) for _ in range(11))
+        videos.append({"Title": f"Video number {i}", "Link": f"https://www.youtube.com/watch?v={videoID}",
+                       "Views": f"{rng.randint(0, 10**7):,} views", "Duration": f"{rng.randint(0, 59)}:{rng.randint(0, 59):02}", "Availability": True})
+    return videos
+
+
+def mutate(olddata: list, seed: int = 1):
+    """
+        Build a new snapshot with a realistic mix of changes: a few uploads, removals, renames and lots of view changes
+    """
+    rng = random.Random(seed)
+    newdata = copy.deepcopy(olddata)
+    for video in newdata:
+        if rng.random() < 0.5:
+            video["Views"] = f"{rng.randint(0, 10**7):,} views"
+        if rng.random() < 0.001:
+            video["Title"] += " (renamed)"
+    for _ in range(max(1, len(newdata) // 1000)):
+        newdata.pop(rng.randrange(len(newdata)))
+    return makeVideos(max(1, len(olddata) // 500), seed + 1) + newdata
+
+
+def legacyDiffAndMerge(olddata: list, newdata: list):
+    """
+        The nested loops detectAndSaveChanges used before, with file writes stripped out
+    """
+    changes = 0
+    for newSubdata in newdata:
+        exists = False
+        for oldSubdata in olddata:
+            if (newSubdata["Link"] == oldSubdata["Link"]):
+                if oldSubdata["Views"] != newSubdata["Views"]:
+                    changes += 1
+                if (oldSubdata["Duration"] != newSubdata["Duration"]):
+                    changes += 1
+                if (oldSubdata["Title"] != newSubdata["Title"]):
+                    changes += 1
+                exists = True
+        if not exists:
+            changes += 1
+    for oldSubdata in olddata:
+        exists = False
+        for newSubdata in newdata:
+            if (newSubdata["Link"] == oldSubdata["Link"]):
+                exists = True
+                break
+        oldSubdata["Availability"] = True
+        if not exists:
+            changes += 1
+            oldSubdata["Availability"] = False
+    index = 0
+    for newSubdata in newdata:
+        add = True
+        for oldSubdata in olddata:
+            if oldSubdata["Link"] == newSubdata["Link"]:
+                oldSubdata["Title"] = newSubdata["Title"]
+                oldSubdata["Views"] = newSubdata["Views"]
+                oldSubdata["Duration"] = newSubdata["Duration"]
+                add = False
+                break
+        if add:
+            if index > len(olddata):
+                index = len(olddata)
+            olddata.insert(index, newSubdata)
+        index += 1
+    return changes
+
+
+def hashedDiffAndMerge(olddata: list, newdata: list):
+    changes = diffVideoData(olddata, newdata)
+    mergeVideoChanges(olddata, changes)
+    return len(changes)
+
+
+def timeIt(function, olddata: list, newdata: list):
+    olddata = copy.deepcopy(olddata)
+    start = perf_counter()
+    changes = function(olddata, newdata)
+    return perf_counter() - start, changes, olddata
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-s", "--sizes", help="Channel sizes to benchmark", nargs='*', type=int, default=[1000, 10000, 100000])
+    parser.add_argument(
+        "--legacy-limit", help="Largest size to run the old nested loops on (they are quadratic)", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'videos':>8} {'legacy (s)':>12} {'hashed (s)':>12} {'speedup':>9} {'changes':>9}")
+    for size in args.sizes:
+        olddata = makeVideos(size)
+        newdata = mutate(olddata)
+        hashedTime, hashedChanges, hashedMerged = timeIt(hashedDiffAndMerge, olddata, newdata)
+        if size <= args.legacy_limit:
+            legacyTime, _, legacyMerged = timeIt(legacyDiffAndMerge, olddata, newdata)
+            assert legacyMerged == hashedMerged, "Merged data differs between implementations"
+            print(f"{size:>8} {legacyTime:>12.3f} {hashedTime:>12.3f} {legacyTime / hashedTime:>8.0f}x {hashedChanges:>9}")
+        else:
+            print(f"{size:>8} {'skipped':>12} {hashedTime:>12.3f} {'-':>9} {hashedChanges:>9}")
@@ -0,0 +1,81 @@
+#compare the byte-level embedded JSON extractor against the old str.split chains
+#run from the repository root: python3 benchmarks/extract_benchmark.py [saved pages...]
+#without arguments a synthetic channel /videos page is used, save real pages from a browser to benchmark against those
+import argparse
+import json
+import sys
+import tracemalloc
+from os import path
+from time import perf_counter
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from collector import extractEmbeddedJson, orjson, _YtcfgBlob, _YtInitialDataBlob
+
+
+def makePage(videoCount: int = 300, emergencyUrl: bool = False):
+    """
+        Roughly the shape of a channel /videos page: ytcfg near the top, lots of markup, ytInitialData near the end
+        emergencyUrl adds the ytcfg.set call with a key and value that real pages make before the one with the config
+    """
+    ytcfg = {"INNERTUBE_API_KEY": "KEY", "INNERTUBE_CONTEXT": {"client": {"hl": "en", "gl": "US", "visitorData": "VD", "clientName": "WEB", "clientVersion": "2.0"}},
+             "FILLER": ["x" * 100] * 500}
+    items = [{"richItemRenderer": {"content": {"videoRenderer": {"videoId": f"{i:011}", "title": {"runs": [{"text": f"Video é {i}"}]},
+                                                                 "viewCountText": {"simpleText": f"{i * 1000:,} views"},
+                                                                 "thumbnailOverlays": [{"thumbnailOverlayTimeStatusRenderer": {"text": {"simpleText": "10:00"}}}],
+                                                                 "thumbnail": {"thumbnails": [{"url": "https://i.ytimg.com/vi/x/hqdefault.jpg", "width": 168, "height": 94}] * 4}}}}}
+             for i in range(videoCount)]
+    initialData = {"contents": {"twoColumnBrowseResultsRenderer": {"tabs": [{"tabRenderer": {}}, {"tabRenderer": {"content": {"richGridRenderer": {"contents": items}}}}]}}}
+    emergencyCall = "window.ytcfg.set('EMERGENCY_BASE_URL', '\\/error_204?level=ERROR');" if emergencyUrl else ""
+    return ("<html><head><script>" + emergencyCall + "ytcfg.set(" + json.dumps(ytcfg) + "); window.ytcfg.obfuscatedData_ = [];</script></head><body>"
+            + "<div class='x'></div>" * 20000 + "<script>var ytInitialData = " + json.dumps(initialData) + ";</script></body></html>").encode()
+
+
+def legacyExtract(content: bytes):
+    text = content.decode("utf-8")
+    ytcfg = json.loads(
+        '{' + text.split("ytcfg.set({")[1].split("); window.ytcfg.obfuscatedData")[0])
+    initialData = json.loads(text.split(
+        'ytInitialData = ')[1].split(';</script>')[0])
+    return ytcfg, initialData
+
+
+def newExtract(content: bytes):
+    return extractEmbeddedJson(content, *_YtcfgBlob), extractEmbeddedJson(content, *_YtInitialDataBlob)
+
+
+def measure(function, content: bytes, repeats: int):
+    best = float("inf")
+    for _ in range(repeats):
+        start = perf_counter()
+        result = function(content)
+        best = min(best, perf_counter() - start)
+    tracemalloc.start()
+    function(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "pages", help="Saved channel /videos pages to use as fixtures", nargs='*')
+    parser.add_argument(
+        "-r", "--repeats", help="Runs per fixture, the best one is reported", type=int, default=20)
+    args = parser.parse_args()
+
+    fixtures = []
+    for pagePath in args.pages:
+        with open(pagePath, 'rb') as f:
+            fixtures.append((path.basename(pagePath), f.read()))
+    if not fixtures:
+        fixtures.append(("synthetic", makePage()))
+        fixtures.append(("emergency url", makePage(emergencyUrl=True)))
+
+    print(f"json backend: {'orjson' if orjson else 'json'}")
+    print(f"{'fixture':<20} {'size (KB)':>10} {'legacy (ms)':>12} {'new (ms)':>10} {'legacy peak (KB)':>17} {'new peak (KB)':>14}")
+    for name, content in fixtures:
+        legacyTime, legacyPeak, legacyResult = measure(legacyExtract, content, args.repeats)
+        newTime, newPeak, newResult = measure(newExtract, content, args.repeats)
+        assert legacyResult == newResult, f"Extractors disagree on {name}"
+        print(f"{name:<20} {len(content) / 1024:>10.0f} {legacyTime * 1000:>12.2f} {newTime * 1000:>10.2f} {legacyPeak / 1024:>17.0f} {newPeak / 1024:>14.0f}")
@@ -0,0 +1,204 @@
+#local stand-in for the parts of youtube.com the collector talks to, for benchmarking without the network
+#serves the homepage, /results, /channel/<id>, /channel/<id>/videos and youtubei/v1/browse in the shapes YouTube uses
+#run from the repository root: python3 benchmarks/fakeyoutube.py --port 8080 --videos 5000
+#channels are made up on request: "bench 12" (or its ID, see channelID) has --videos videos, newest first
+import argparse
+import hashlib
+import json
+import random
+import re
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from time import sleep
+from urllib.parse import urlsplit, parse_qs
+
+_ContinuationTokenPattern = re.compile(r"^(UC[0-9A-Za-z_-]{22}):(\d+)$")
+_ChannelVideosPattern = re.compile(r"^/channel/(UC[0-9A-Za-z_-]{22})(/videos)?$")
+_IDAlphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+_Ytcfg = {"INNERTUBE_API_KEY": "BENCHMARK_KEY",
+          "INNERTUBE_CONTEXT": {"client": {"hl": "en", "gl": "US", "visitorData": "BENCHMARK_VISITOR", "clientName": "WEB", "clientVersion": "2.20260101.00.00"}}}
+
+
+def makeID(seed: str, length: int):
+    digest = hashlib.sha256(seed.encode()).digest()
+    return "".join(_IDAlphabet[byte % 64] for byte in digest[:length])
+
+
+def channelID(channelName: str):
+    return "UC" + makeID(channelName.casefold(), 22)
+
+
+class FakeYouTube:
+    """
+        Channel contents and injected failures, shared by all request handlers
+        generation changes view counts, titles and uploads the way time between two real runs would
+    """
+
+    def __init__(self, videos: int = 1000, pageSize: int = 30, latency: float = 0, errorRate: float = 0, generation: int = 0, seed: int = 0):
+        self.videos = videos
+        self.pageSize = pageSize
+        self.latency = latency
+        self.errorRate = errorRate
+        self.generation = generation
+        self.random = random.Random(seed)
+        self.channelNames = {}
+
+    def resolve(self, channelName: str):
+        ID = channelID(channelName)
+        self.channelNames[ID] = channelName
+        return ID
+
+    def videoCount(self):
+        #every generation uploads a few new videos
+        return self.videos + self.generation * max(1, self.videos // 500)
+
+    def videoItem(self, ID: str, index: int):
+        """
+            richItemRenderer for the index-th newest video of a channel
+        """
+        #number videos from the oldest so uploads don't shift the ids of older ones
+        number = self.videoCount() - index
+        videoID = makeID(f"{ID}/{number}", 11)
+        rng = random.Random(f"{videoID}/{self.generation}")
+        title = f"Video {number} of {ID}"
+        if rng.random() < 0.001 * self.generation:
+            title += " (renamed)"
+        return {"richItemRenderer": {"content": {"videoRenderer": {
+            "videoId": videoID, "title": {"runs": [{"text": title}]},
+            "viewCountText": {"simpleText": f"{rng.randint(0, 10**7):,} views"},
+            "thumbnailOverlays": [{"thumbnailOverlayTimeStatusRenderer": {"text": {"simpleText": f"{number % 50}:{number % 60:02}"}}}],
+            "thumbnail": {"thumbnails": [{"url": f"https://i.ytimg.com/vi/{videoID}/hqdefault.jpg", "width": 168, "height": 94}] * 4},
+            "descriptionSnippet": {"runs": [{"text": "Lorem ipsum dolor sit amet " * 4}]}}}}}
+
+    def page(self, ID: str, offset: int):
+        """
+            One page of richGridRenderer items from offset on, ending with a continuation item unless it is the last one
+        """
+        end = min(offset + self.pageSize, self.videoCount())
+        items = [self.videoItem(ID, index) for index in range(offset, end)]
+        if end < self.videoCount():
+            items.append({"continuationItemRenderer": {"continuationEndpoint": {"continuationCommand": {
+                "token": f"{ID}:{end}", "request": "CONTINUATION_REQUEST_TYPE_BROWSE"}}}})
+        return items
+
+    def browseData(self, ID: str):
+        return {"contents": {"twoColumnBrowseResultsRenderer": {"tabs": [
+            {"tabRenderer": {"title": "Home"}},
+            {"tabRenderer": {"title": "Videos", "content": {"richGridRenderer": {"contents": self.page(ID, 0)}}}}]}},
+            "metadata": {"channelMetadataRenderer": {"externalId": ID, "title": self.channelNames.get(ID, ID)}}}
+
+    def continuationData(self, token: str):
+        match = _ContinuationTokenPattern.match(token)
+        if not match:
+            return None
+        return {"onResponseReceivedActions": [{"appendContinuationItemsAction": {"continuationItems": self.page(match.group(1), int(match.group(2)))}}]}
+
+    def searchData(self, query: str):
+        ID = self.resolve(query)
+        return {"contents": {"twoColumnSearchResultsRenderer": {"primaryContents": {"sectionListRenderer": {"contents": [{"itemSectionRenderer": {"contents": [
+            {"channelRenderer": {"channelId": ID, "title": {"simpleText": query}}}]}}]}}}}}
+
+
+def htmlPage(initialData: dict = None):
+    page = "<html><head><script>window.ytcfg.set('EMERGENCY_BASE_URL', '\\/error_204?level=ERROR');ytcfg.set(" + json.dumps(_Ytcfg) + "); window.ytcfg.obfuscatedData_ = [];</script></head><body>" + "<div></div>" * 2000
+    if initialData is not None:
+        page += "<script>var ytInitialData = " + json.dumps(initialData) + ";</script>"
+    return (page + "</body></html>").encode()
+
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    #headers and body go out in separate writes, don't let Nagle hold the body back on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status: int, body: bytes = b"", contentType: str = "application/json", headers: dict = {}):
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def injectFailure(self):
+        """
+            Answer with a throttled or failed response for --error-rate of the requests
+        """
+        youtube = self.server.youtube
+        if youtube.latency:
+            sleep(youtube.latency)
+        if youtube.errorRate and youtube.random.random() < youtube.errorRate:
+            if youtube.random.random() < 0.5:
+                self.send(HTTPStatus.TOO_MANY_REQUESTS, headers={"Retry-After": "0"})
+            else:
+                self.send(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return True
+        return False
+
+    def do_GET(self):
+        if self.injectFailure():
+            return
+        youtube = self.server.youtube
+        url = urlsplit(self.path)
+        match = _ChannelVideosPattern.match(url.path)
+        if url.path == "/":
+            self.send(HTTPStatus.OK, htmlPage(), "text/html")
+        elif url.path == "/results":
+            query = parse_qs(url.query).get("search_query", [""])[0]
+            self.send(HTTPStatus.OK, htmlPage(youtube.searchData(query)), "text/html")
+        elif match:
+            self.send(HTTPStatus.OK, htmlPage(youtube.browseData(match.group(1))), "text/html")
+        else:
+            self.send(HTTPStatus.NOT_FOUND, b"Not found", "text/plain")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.injectFailure():
+            return
+        youtube = self.server.youtube
+        if urlsplit(self.path).path != "/youtubei/v1/browse":
+            self.send(HTTPStatus.NOT_FOUND, b"Not found", "text/plain")
+            return
+        postData = json.loads(body)
+        if "continuation" in postData:
+            data = youtube.continuationData(postData["continuation"])
+        else:
+            data = youtube.browseData(postData["browseId"])
+        if data is None:
+            self.send(HTTPStatus.BAD_REQUEST, b'{"error": {"code": 400}}')
+            return
+        self.send(HTTPStatus.OK, json.dumps(data).encode())
+
+
+def makeServer(youtube: FakeYouTube, port: int = 0):
+    """
+        HTTP server for youtube on localhost, port 0 picks a free one (see server.server_port)
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeYouTubeHandler)
+    server.daemon_threads = True
+    server.youtube = youtube
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-p", "--port", help="Port to listen on", type=int, default=8080)
+    parser.add_argument(
+        "--videos", help="Videos per channel", type=int, default=1000)
+    parser.add_argument(
+        "--page-size", help="Videos per page", type=int, default=30)
+    parser.add_argument(
+        "--latency", help="Seconds to wait before answering each request", type=float, default=0)
+    parser.add_argument(
+        "--error-rate", help="Share of requests answered with a 429 or 500", type=float, default=0)
+    parser.add_argument(
+        "--generation", help="Bump to change views, titles and uploads like a later run would see", type=int, default=0)
+    args = parser.parse_args()
+
+    server = makeServer(FakeYouTube(args.videos, args.page_size, args.latency, args.error_rate, args.generation), args.port)
+    print(f"Serving a fake youtube.com on http://127.0.0.1:{server.server_port}")
+    server.serve_forever()
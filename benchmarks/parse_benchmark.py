@@ -0,0 +1,125 @@
+#compare the single-lookup video item parser against the old per-field lookup chains
+#run from the repository root: python3 benchmarks/parse_benchmark.py
+#pages are continuation responses from benchmarks/fakeyoutube.py, some of their videos have no views or duration like live streams
+import argparse
+import json
+import sys
+import tracemalloc
+from os import path
+from time import perf_counter
+
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from collector import loadJson, parseVideoItems, orjson
+from fakeyoutube import FakeYouTube, channelID
+
+
+def makePages(pageCount: int, pageSize: int, missingEvery: int):
+    youtube = FakeYouTube(videos=pageCount * pageSize, pageSize=pageSize)
+    ID = channelID("bench")
+    pages = []
+    for offset in range(0, pageCount * pageSize, pageSize):
+        data = youtube.continuationData(f"{ID}:{offset}")
+        for i, item in enumerate(data["onResponseReceivedActions"][0]["appendContinuationItemsAction"]["continuationItems"]):
+            if missingEvery and i % missingEvery == 0 and "richItemRenderer" in item:
+                renderer = item["richItemRenderer"]["content"]["videoRenderer"]
+                del renderer["viewCountText"]
+                del renderer["thumbnailOverlays"]
+        pages.append(json.dumps(data).encode())
+    return pages
+
+
+def legacyParseVideoList(videoList: list, verbosity: int):
+    """
+        parseVideoList as it was, self.print formatted its message before checking the verbosity
+    """
+    def log(verbosityPriority: int, message: str):
+        if verbosityPriority <= verbosity:
+            print(message)
+    videoData = []
+    continuationToken = None
+    for video in videoList:
+        if "continuationItemRenderer" in video:
+            continuationToken = video["continuationItemRenderer"]["continuationEndpoint"]["continuationCommand"]["token"]
+            log(3, f"More videos exist, continuation token is {continuationToken}")
+            continue
+        views = "NaN"
+        length = "NaN"
+        videoID = video["richItemRenderer"]["content"]["videoRenderer"]["videoId"]
+        title = video["richItemRenderer"]["content"]["videoRenderer"]["title"]["runs"][0]["text"]
+        try:
+            views = video["richItemRenderer"]["content"]["videoRenderer"]["viewCountText"]["simpleText"]
+        except:
+            log(3, f"No views in data for {title}, setting NaN")
+        try:
+            length = video["richItemRenderer"]["content"]["videoRenderer"]["thumbnailOverlays"][0]["thumbnailOverlayTimeStatusRenderer"]["text"]["simpleText"]
+        except:
+            log(3, f"No video length in data for {title}, setting NaN")
+        videoData.append(
+            {"Title": title, "Link": f"https://www.youtube.com/watch?v={videoID}", "Views": views, "Duration": length, "Availability": True})
+    return videoData, continuationToken
+
+
+def legacyParsePage(page: bytes):
+    nextJsonData = loadJson(page)
+    return legacyParseVideoList(nextJsonData["onResponseReceivedActions"][0]["appendContinuationItemsAction"]["continuationItems"], 1)
+
+
+def newParsePage(page: bytes):
+    nextJsonData = loadJson(page)
+    videoData, continuationToken, _ = parseVideoItems(
+        nextJsonData["onResponseReceivedActions"][0]["appendContinuationItemsAction"]["continuationItems"])
+    return videoData, continuationToken
+
+
+def measure(function, pages: list, repeats: int):
+    """
+        Best time per page over repeats, and the peak of Python allocations while parsing one page
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = perf_counter()
+        results = [function(page) for page in pages]
+        best = min(best, perf_counter() - start)
+    tracemalloc.start()
+    function(pages[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best / len(pages), peak, results
+
+
+def measureItems(function, itemLists: list, repeats: int):
+    best = float("inf")
+    for _ in range(repeats):
+        start = perf_counter()
+        for items in itemLists:
+            function(items)
+        best = min(best, perf_counter() - start)
+    return best / len(itemLists)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--pages", help="Continuation pages to parse", type=int, default=200)
+    parser.add_argument(
+        "--page-size", help="Videos per page", type=int, default=30)
+    parser.add_argument(
+        "--missing-every", help="Every n-th video has no views or duration (0 for none)", type=int, default=10)
+    parser.add_argument(
+        "-r", "--repeats", help="Runs over all pages, the best one is reported", type=int, default=10)
+    args = parser.parse_args()
+
+    pages = makePages(args.pages, args.page_size, args.missing_every)
+    legacyTime, legacyPeak, legacyResults = measure(legacyParsePage, pages, args.repeats)
+    newTime, newPeak, newResults = measure(newParsePage, pages, args.repeats)
+    assert legacyResults == newResults, "Parsers disagree"
+    itemLists = [loadJson(page)["onResponseReceivedActions"][0]["appendContinuationItemsAction"]["continuationItems"] for page in pages]
+    legacyItemsTime = measureItems(lambda items: legacyParseVideoList(items, 1), itemLists, args.repeats)
+    newItemsTime = measureItems(parseVideoItems, itemLists, args.repeats)
+
+    print(f"json backend: {'orjson' if orjson else 'json'}, {args.pages} pages of {args.page_size} videos, {sum(map(len, pages)) / len(pages) / 1024:.0f} KB each")
+    print(f"{'per page':<22} {'legacy':>10} {'new':>10} {'speedup':>9}")
+    print(f"{'decode + parse (us)':<22} {legacyTime * 1e6:>10.0f} {newTime * 1e6:>10.0f} {legacyTime / newTime:>8.2f}x")
+    print(f"{'item parsing (us)':<22} {legacyItemsTime * 1e6:>10.0f} {newItemsTime * 1e6:>10.0f} {legacyItemsTime / newItemsTime:>8.2f}x")
+    print(f"{'peak memory (KB)':<22} {legacyPeak / 1024:>10.0f} {newPeak / 1024:>10.0f}")
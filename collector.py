@@ -1,29 +1,962 @@
 #collect a list of all youtube videos for a channel, allowing you to detect when a video gets unlisted/removed
 import requests
 import json
+import os
 from os import path
 from datetime import datetime
-from time import sleep
+from time import sleep, monotonic, perf_counter
 import argparse
 import sqlite3
 from http import HTTPStatus
 import traceback
+import shutil
+import re
+from collections import namedtuple, deque, defaultdict
+import threading
+import random
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import heapq
+from requests.adapters import HTTPAdapter
 
 #validate file names
 from pathvalidate import sanitize_filename
-_SupportedDatabases = {"sqlite", "json"}
+#optional faster json backend
+try:
+    import orjson
+except ImportError:
+    orjson = None
+_SupportedDatabases = {"sqlite", "json", "jsonl"}
 _ScriptPath = path.dirname(path.abspath(__file__))
 _SqliteSchemaFileLocation = path.join(_ScriptPath, "schema.sql")
+_ChannelIDPattern = re.compile(r"^UC[0-9A-Za-z_-]{22}$")
+#browse params selecting a channel's videos tab
+_VideosTabParams = "EgZ2aWRlb3PyBgQKAjoA"
+#(marker, terminator) pairs around the JSON blobs embedded in YouTube's HTML pages
+#a marker ending in the value's opening bracket skips look-alikes such as ytcfg.set('EMERGENCY_BASE_URL', ...)
+_YtInitialDataBlob = (b"ytInitialData = ", b";</script>")
+_YtcfgBlob = (b"ytcfg.set({", b"); window.ytcfg.obfuscatedData")
+_SavePreferenceUrlBlob = (b'savePreferenceUrl":', b"}")
+_JsonDecoder = json.JSONDecoder()
+#user_version of schema.sql, and the migrations that bring older databases up to it
+_SqliteSchemaVersion = 2
+_SqliteMigrations = [(2, path.join(_ScriptPath, "migrations", "0002_normalize.sql"))]
+_UpsertVideoSql = ("INSERT INTO video (video_id, channel_id, video_title, video_views, video_duration, video_availability, first_seen, last_changed) "
+                   "VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP) "
+                   "ON CONFLICT(video_id) DO UPDATE SET channel_id = excluded.channel_id, video_title = excluded.video_title, video_views = excluded.video_views, "
+                   "video_duration = excluded.video_duration, video_availability = excluded.video_availability, last_changed = excluded.last_changed")
+_UpsertChannelSql = "INSERT INTO channel (channel_id, channel_name) VALUES (?, ?) ON CONFLICT(channel_id) DO UPDATE SET channel_name = excluded.channel_name"
+_InsertNewVideoSql = ("INSERT INTO video (video_id, channel_id, video_title, video_views, video_duration, video_availability, first_seen, last_changed) "
+                      "VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP) ON CONFLICT(video_id) DO NOTHING")
+_InsertHistorySql = ("INSERT INTO video_history (video_key, changed_at, change, old_value, new_value) "
+                     "SELECT video_key, CURRENT_TIMESTAMP, ?, ?, ? FROM video WHERE video_id = ?")
+_VideoLinkPrefix = "https://www.youtube.com/watch?v="
+_NoText = {}
+_DurationPattern = re.compile(r"^(?:(\d+):)?(\d+):(\d\d)$")
+#responses worth retrying, and the ones among them that mean YouTube wants us to slow down
+_RetryStatuses = {HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.INTERNAL_SERVER_ERROR,
+                  HTTPStatus.BAD_GATEWAY, HTTPStatus.SERVICE_UNAVAILABLE, HTTPStatus.GATEWAY_TIMEOUT}
+_ThrottleStatuses = {HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE}
+#bounds in seconds of the exponential backoff between retries
+_RetryBaseDelay = 1
+_RetryMaxDelay = 120
+#slowest the rate limiter goes when throttled, and how many requests per second it wins back per throttle-free second
+_MinRequestRate = 0.1
+_RequestRateRecovery = 0.05
+#hours between polls of a channel in daemon mode before anything is known about how often it uploads
+_InitialPollHours = 24
 
 #TODOS:
-#not accounting for possible captcha appearings or request limiting that might be enforced on IP
+#captchas are only waited out with backoff, never solved
 #video upload dates not stored. tried my best to keep them organized by dates but some changes bring older videos to top
-#better exception handling needed. changes might be lost for long sessions if something wrong happens(added basic error logging for now)
 #improve readability
 
+#a single detected difference between the stored and the freshly crawled video lists
+#position is the index of the video in the new list (only used for additions)
+VideoChange = namedtuple("VideoChange", ["kind", "old", "new", "position"])
+
+
+class SiteFormatError(Exception):
+    """
+        A YouTube page couldn't be parsed, details are in the error log
+    """
+
+
+def videoIDFromLink(link: str):
+    return link.rsplit("v=", 1)[-1]
+
+
+def parseViewCount(views):
+    """
+        Number of views from YouTube's view count text ("1,234,567 views", "No views"), None when there is none
+    """
+    if views is None or isinstance(views, int):
+        return views
+    if views == "NaN":
+        return None
+    digits = re.sub(r"\D", "", views)
+    return int(digits) if digits else 0
+
+
+def parseVideoItems(items: list):
+    """
+        Video records from one page of richGridRenderer items, the continuation token for the next page (None on the last page)
+        and the titles of videos without views or a duration, those are set to "NaN"
+        Each item's videoRenderer is looked up once and every field read straight from it
+    """
+    videoData = []
+    continuationToken = None
+    incomplete = []
+    for item in items:
+        itemRenderer = item.get("richItemRenderer")
+        if itemRenderer is None and "continuationItemRenderer" in item:
+            continuationToken = item["continuationItemRenderer"]["continuationEndpoint"]["continuationCommand"]["token"]
+            continue
+        renderer = itemRenderer["content"]["videoRenderer"]
+        title = renderer["title"]["runs"][0]["text"]
+        #these two sometimes dont exist
+        views = renderer.get("viewCountText", _NoText).get("simpleText", "NaN")
+        try:
+            length = renderer["thumbnailOverlays"][0]["thumbnailOverlayTimeStatusRenderer"]["text"]["simpleText"]
+        except (KeyError, IndexError):
+            length = "NaN"
+        if views == "NaN" or length == "NaN":
+            incomplete.append(title)
+        videoData.append({"Title": title, "Link": _VideoLinkPrefix + renderer["videoId"],
+                          "Views": views, "Duration": length, "Availability": True})
+    return videoData, continuationToken, incomplete
+
+
+def parseDuration(duration):
+    """
+        Seconds from a "h:mm:ss" or "m:ss" duration, None for anything else (live streams, missing durations)
+    """
+    if duration is None or isinstance(duration, int):
+        return duration
+    match = _DurationPattern.match(duration.strip())
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def formatViewCount(views: int):
+    if views is None:
+        return "NaN"
+    if views == 0:
+        return "No views"
+    return f"{views:,} view{'' if views == 1 else 's'}"
+
+
+def formatDuration(duration: int):
+    if duration is None:
+        return "NaN"
+    minutes, seconds = divmod(duration, 60)
+    if minutes < 60:
+        return f"{minutes}:{seconds:02}"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}"
+
+
+def historyRecord(change: VideoChange):
+    """
+        (change, old_value, new_value, video_id) row for the video_history table, views and durations are stored as numbers
+    """
+    if change.kind == "views":
+        return change.kind, parseViewCount(change.old["Views"]), parseViewCount(change.new["Views"]), videoIDFromLink(change.new["Link"])
+    if change.kind == "duration":
+        return change.kind, parseDuration(change.old["Duration"]), parseDuration(change.new["Duration"]), videoIDFromLink(change.new["Link"])
+    if change.kind == "title":
+        return change.kind, change.old["Title"], change.new["Title"], videoIDFromLink(change.new["Link"])
+    if change.kind == "added":
+        return change.kind, None, change.new["Title"], videoIDFromLink(change.new["Link"])
+    #removed and restored
+    return change.kind, None, None, videoIDFromLink(change.old["Link"])
+
+
+def loadJson(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def extractEmbeddedJson(page: bytes, marker: bytes, terminator: bytes):
+    """
+        Parse only the JSON value right after marker in a raw page, without decoding or copying the rest of it
+        terminator bounds the slice that gets decoded, raises ValueError if the marker isn't in the page
+        A marker may end with the value's opening bracket, decoding then starts at that bracket
+    """
+    start = page.find(marker)
+    if start == -1:
+        raise ValueError(f"{marker} not found in page")
+    start += len(marker)
+    if marker.endswith((b"{", b"[")):
+        start -= 1
+    end = page.find(terminator, start)
+    blob = page[start:end if end != -1 else len(page)]
+    if orjson is not None and end != -1:
+        try:
+            return orjson.loads(blob)
+        except orjson.JSONDecodeError:
+            #the terminator isn't always exactly where the value ends, let raw_decode find it
+            pass
+    value, _ = _JsonDecoder.raw_decode(blob.decode("utf-8"))
+    return value
+
+
+def _embeddedBlobsComplete(content: bytearray, scans: list):
+    """
+        Incrementally scan a growing download for [marker, terminator, markerEnd, scanFrom] entries
+        Returns True once every marker and the terminator after it have arrived
+    """
+    complete = True
+    for scan in scans:
+        marker, terminator, markerEnd, scanFrom = scan
+        if markerEnd == -1:
+            found = content.find(marker, scanFrom)
+            if found == -1:
+                scan[3] = max(0, len(content) - len(marker))
+                complete = False
+                continue
+            markerEnd = scan[2] = scan[3] = found + len(marker)
+        if content.find(terminator, scan[3]) == -1:
+            scan[3] = max(markerEnd, len(content) - len(terminator))
+            complete = False
+    return complete
+
+
+def atomicWriteJson(filePath: str, data):
+    """
+        Write through a temp file and rename it over the target, so a crash mid-dump never leaves a truncated file
+    """
+    tempFilePath = filePath + ".tmp"
+    with open(tempFilePath, 'w') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    os.replace(tempFilePath, filePath)
+
+
+def dumpJsonLine(record):
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def atomicWriteJsonLines(filePath: str, records):
+    """
+        atomicWriteJson for JSON Lines files, records are written one per line as they are consumed
+    """
+    tempFilePath = filePath + ".tmp"
+    with open(tempFilePath, 'wb') as f:
+        for record in records:
+            f.write(dumpJsonLine(record))
+    os.replace(tempFilePath, filePath)
+
+
+def readVideoDatabaseFile(filePath: str):
+    """
+        (video_id, title, views, duration, availability) rows for the SQLite video table from a VE_ Json or Json Lines file
+        Rows are oldest first and unique by video id. Module level so it can run in a ProcessPoolExecutor
+    """
+    videosByID = {}
+    with open(filePath, 'rb') as f:
+        if filePath.endswith(".jsonl"):
+            for line in f:
+                #skip a torn last record, like _JsonLinesStorage.readChannel
+                if not line.endswith(b"\n"):
+                    break
+                video = loadJson(line)
+                videosByID[videoIDFromLink(video["Link"])] = video
+        else:
+            for video in reversed(loadJson(f.read())):
+                videosByID[videoIDFromLink(video["Link"])] = video
+    return [(videoID, video.get("Title"), parseViewCount(video.get("Views")), parseDuration(video.get("Duration")), video.get("Availability", True))
+            for videoID, video in videosByID.items()]
+
+
+def tryReadVideoDatabaseFile(filePath: str):
+    """
+        readVideoDatabaseFile, returns (rows, None) or (None, error message) for a truncated or corrupt file
+    """
+    try:
+        return readVideoDatabaseFile(filePath), None
+    except (ValueError, KeyError, TypeError) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def iterVideoChanges(olddata: list, newdata, stopAfterKnown: int = 0):
+    """
+        Compare stored videos against a (possibly streamed) iterable of new videos keyed by video ID in a single pass
+        Yields the list of VideoChange for each new video that changed as soon as it is seen, then one list per removed video
+        Only the IDs of new videos are kept around, so new data can be consumed page by page
+        With stopAfterKnown, stops consuming newdata after that many already stored videos in a row and skips removal detection
+    """
+    oldByID = {videoIDFromLink(video["Link"]): video for video in olddata}
+    seen = set()
+    knownRun = 0
+    for position, newVideo in enumerate(newdata):
+        videoID = videoIDFromLink(newVideo["Link"])
+        #pages can shift while crawling, don't count a video twice
+        if videoID in seen:
+            continue
+        seen.add(videoID)
+        oldVideo = oldByID.get(videoID)
+        if oldVideo is None:
+            knownRun = 0
+            yield [VideoChange("added", None, newVideo, position)]
+            continue
+        knownRun += 1
+        videoChanges = []
+        #compare numbers, stored and crawled text can be formatted differently for the same count
+        if oldVideo["Views"] != newVideo["Views"] and parseViewCount(oldVideo["Views"]) != parseViewCount(newVideo["Views"]):
+            videoChanges.append(VideoChange("views", oldVideo, newVideo, position))
+        if oldVideo["Duration"] != newVideo["Duration"] and parseDuration(oldVideo["Duration"]) != parseDuration(newVideo["Duration"]):
+            videoChanges.append(VideoChange("duration", oldVideo, newVideo, position))
+        if oldVideo["Title"] != newVideo["Title"]:
+            videoChanges.append(VideoChange("title", oldVideo, newVideo, position))
+        if oldVideo.get("Availability", True) is False:
+            videoChanges.append(VideoChange("restored", oldVideo, newVideo, position))
+        if videoChanges:
+            yield videoChanges
+        if stopAfterKnown and knownRun >= stopAfterKnown:
+            #the rest of the channel is already indexed, removals are left to the next full scan
+            return
+    for videoID, oldVideo in oldByID.items():
+        if videoID not in seen:
+            yield [VideoChange("removed", oldVideo, None, None)]
+
+
+def diffVideoData(olddata: list, newdata):
+    """
+        Full change set between stored and new videos as a flat list of VideoChange, ordered the same way the changelog is written
+    """
+    return [change for videoChanges in iterVideoChanges(olddata, newdata) for change in videoChanges]
+
+
+def mergeVideoChanges(olddata: list, changes: list):
+    """
+        Apply a change set from diffVideoData to the stored video list in place
+        New videos are inserted at their position in the new list to preserve by-date order
+    """
+    for change in changes:
+        if change.kind == "added":
+            olddata.insert(min(change.position, len(olddata)), change.new)
+        elif change.kind == "removed":
+            change.old["Availability"] = False
+        else:
+            change.old["Title"] = change.new["Title"]
+            change.old["Views"] = change.new["Views"]
+            change.old["Duration"] = change.new["Duration"]
+            change.old["Availability"] = True
+    return olddata
+
+
+def parseRetryAfter(value: str):
+    """
+        Seconds to wait from a Retry-After header, which is either a number of seconds or an HTTP date. None if missing or unreadable
+    """
+    if not value:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0, (parsedate_to_datetime(value) - datetime.now().astimezone()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def retryDelay(attempt: int, retryAfter: float = None):
+    """
+        How long to wait before retry number attempt (from 0): Retry-After when YouTube sent one, otherwise exponential backoff with full jitter
+    """
+    if retryAfter is not None:
+        return min(retryAfter, _RetryMaxDelay)
+    return random.uniform(0, min(_RetryMaxDelay, _RetryBaseDelay * 2 ** attempt))
+
+
+def isConsentUrl(url: str):
+    #YouTube sends clients without (valid) consent cookies to consent.youtube.com
+    return str(url).startswith("https://consent.")
+
+
+def isCaptchaUrl(url: str):
+    #throttled clients get redirected to google's "unusual traffic" page
+    return "/sorry/" in str(url)
+
+
+class _RateLimiter:
+    """
+        Global token bucket shared by all workers, requestsPerSecond 0 means no limit until YouTube starts throttling
+        Every throttled request halves the rate, which then creeps back up towards requestsPerSecond while requests succeed
+        All workers draw from the same bucket, so this also caps how many of them can have a request in flight
+    """
+
+    def __init__(self, requestsPerSecond: float, burst: int = 1):
+        self.maxRate = requestsPerSecond
+        #current requests per second, 0 when unlimited
+        self.rate = requestsPerSecond
+        self.burst = max(1, burst)
+        self._tokens = self.burst
+        self._refilled = monotonic()
+        self._pausedUntil = 0
+        self._lastThrottle = None
+        #start times of recent requests, to tell how fast we were going when an unlimited run gets throttled
+        self._recent = deque(maxlen=256)
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+            Book the next free request slot, returns how long the caller has to wait for it
+        """
+        with self._lock:
+            now = monotonic()
+            start = max(now, self._pausedUntil)
+            if self.rate:
+                self._tokens = min(self.burst, self._tokens +
+                                   max(0, start - self._refilled) * self.rate)
+                self._refilled = max(self._refilled, start)
+                #tokens go negative for slots booked ahead of time
+                self._tokens -= 1
+                if self._tokens < 0:
+                    start = self._refilled - self._tokens / self.rate
+            self._recent.append(start)
+            return start - now
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            sleep(delay)
+
+    def throttled(self, retryAfter: float = None):
+        """
+            YouTube pushed back: halve the rate and hold every request until retryAfter seconds have passed
+        """
+        with self._lock:
+            now = monotonic()
+            if retryAfter:
+                self._pausedUntil = max(self._pausedUntil, now + retryAfter)
+            #requests already in flight get throttled too, count them as one
+            if self._lastThrottle is not None and now - self._lastThrottle < 2:
+                return
+            self._lastThrottle = now
+            rate = self.rate
+            if not rate:
+                recent = [start for start in self._recent if now - 10 < start <= now]
+                rate = len(recent) / max(1, now - min(recent, default=now))
+            self.rate = max(_MinRequestRate, rate / 2)
+            self._tokens = min(self._tokens, 0)
+
+    def succeeded(self):
+        """
+            Additive increase after a request went through, about _RequestRateRecovery requests per second gained every second
+        """
+        with self._lock:
+            if not self.rate or self._lastThrottle is None:
+                return
+            self.rate += _RequestRateRecovery / self.rate
+            if self.maxRate and self.rate >= self.maxRate:
+                self.rate = self.maxRate
+                self._lastThrottle = None
+
+
+def requestKind(url: str):
+    """
+        Which part of a crawl a request to url belongs to, used as its phase in _Metrics
+    """
+    url = str(url)
+    if "/youtubei/v1/browse" in url:
+        return "browse"
+    if "/results" in url or "/channel/" in url and not url.endswith("/videos") or "/@" in url:
+        return "search"
+    if url.endswith("/videos"):
+        return "videos_page"
+    return "homepage"
+
+
+class _Metrics:
+    """
+        Counters and per-phase wall time of one run, shared by all workers
+        Phase times add up over workers, so with -w above 1 their sum can exceed the run's wall time
+    """
+    #order of the phases in reports, network phases first
+    Phases = ("homepage", "search", "videos_page", "browse", "parse", "diff", "database")
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.startedAt = datetime.now()
+        self.phaseSeconds = dict.fromkeys(self.Phases, 0.0)
+        self.requests = dict.fromkeys(self.Phases[:4], 0)
+        #bytes, retries, throttled, pages, videos, channels_finished, channels_failed
+        self.counters = defaultdict(int)
+        self.channelPages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.addTime(name, perf_counter() - start)
+
+    def addTime(self, name: str, seconds: float):
+        with self._lock:
+            self.phaseSeconds[name] += seconds
+
+    def add(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def countRequest(self, url: str, seconds: float):
+        kind = requestKind(url)
+        with self._lock:
+            self.requests[kind] += 1
+            self.phaseSeconds[kind] += seconds
+
+    def countPage(self, channelID: str, videos: int):
+        with self._lock:
+            self.channelPages[channelID] = self.channelPages.get(channelID, 0) + 1
+            self.counters["pages"] += 1
+            self.counters["videos"] += videos
+
+    def snapshot(self):
+        """
+            Everything measured so far as a Json-friendly dict
+        """
+        with self._lock:
+            elapsed = perf_counter() - self.started
+            pages = sorted(self.channelPages.values())
+            return {"started": self.startedAt.isoformat(), "elapsed_seconds": elapsed,
+                    "phase_seconds": dict(self.phaseSeconds), "requests": dict(self.requests),
+                    "requests_total": sum(self.requests.values()), "bytes_downloaded": self.counters["bytes"],
+                    "retries": self.counters["retries"], "throttled": self.counters["throttled"],
+                    "channels_finished": self.counters["channels_finished"], "channels_failed": self.counters["channels_failed"],
+                    "pages": self.counters["pages"], "videos": self.counters["videos"],
+                    "pages_per_channel_mean": sum(pages) / len(pages) if pages else 0, "pages_per_channel_max": pages[-1] if pages else 0,
+                    "videos_per_second": self.counters["videos"] / elapsed if elapsed else 0,
+                    "requests_per_second": sum(self.requests.values()) / elapsed if elapsed else 0}
+
+    def summary(self):
+        stats = self.snapshot()
+        lines = [f"Run took {stats['elapsed_seconds']:.2f}s: {stats['channels_finished']} channels done, {stats['channels_failed']} failed",
+                 f"{stats['requests_total']} requests ({stats['requests_per_second']:.2f}/s), {stats['bytes_downloaded'] / 2**20:.1f} MiB downloaded, "
+                 f"{stats['retries']} retries, {stats['throttled']} throttled",
+                 f"{stats['pages']} pages ({stats['pages_per_channel_mean']:.1f} per channel, at most {stats['pages_per_channel_max']}), "
+                 f"{stats['videos']} videos ({stats['videos_per_second']:.1f}/s)",
+                 f"{'phase':<12} {'seconds':>9} {'requests':>9}"]
+        for phase in self.Phases:
+            requests = stats["requests"].get(phase, "")
+            lines.append(f"{phase:<12} {stats['phase_seconds'][phase]:>9.2f} {requests:>9}")
+        return "\n".join(lines)
+
+    def writeJson(self, filePath: str):
+        atomicWriteJson(filePath, self.snapshot())
+
+    def writePrometheus(self, filePath: str):
+        """
+            Write the run's metrics in the Prometheus text format, for node_exporter's textfile collector
+        """
+        stats = self.snapshot()
+        lines = []
+
+        def metric(name: str, kind: str, help: str, samples: dict):
+            lines.append(f"# HELP youtube_indexer_{name} {help}")
+            lines.append(f"# TYPE youtube_indexer_{name} {kind}")
+            for labels, value in samples.items():
+                lines.append(f"youtube_indexer_{name}{labels} {value}")
+
+        metric("last_run_timestamp_seconds", "gauge", "When the last run started.",
+               {"": self.startedAt.timestamp()})
+        metric("run_seconds", "gauge", "Wall time of the last run.",
+               {"": stats["elapsed_seconds"]})
+        metric("phase_seconds", "gauge", "Time spent in each phase of the last run, summed over workers.",
+               {f'{{phase="{phase}"}}': seconds for phase, seconds in stats["phase_seconds"].items()})
+        metric("requests", "gauge", "Requests sent to YouTube in the last run.",
+               {f'{{kind="{kind}"}}': count for kind, count in stats["requests"].items()})
+        for name, help in (("bytes_downloaded", "Bytes downloaded in the last run."), ("retries", "Requests retried in the last run."),
+                           ("throttled", "Requests YouTube throttled in the last run."), ("pages", "Video list pages fetched in the last run."),
+                           ("videos", "Videos crawled in the last run."), ("videos_per_second", "Videos crawled per second in the last run.")):
+            metric(name, "gauge", help, {"": stats[name]})
+        metric("channels", "gauge", "Channels crawled in the last run.",
+               {'{status="finished"}': stats["channels_finished"], '{status="failed"}': stats["channels_failed"]})
+        tempFilePath = filePath + ".tmp"
+        with open(tempFilePath, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tempFilePath, filePath)
+
+
+class _ChannelCheckpoint:
+    """
+        The pages of one channel's crawl, saved as they are fetched so a crawl that stopped halfway goes on from its last page
+        One JSON line per page with its videos, the continuation token for the next page and the Innertube context in use
+    """
+
+    def __init__(self, filePath: str):
+        self.filePath = filePath
+        self.pages = 0
+        self.videos = []
+        self.continuationToken = None
+        self.innertubeContext = None
+
+    def load(self):
+        """
+            Read a checkpoint left by an earlier run, returns how many pages it has
+        """
+        try:
+            with open(self.filePath, 'rb') as f:
+                for line in f:
+                    #the run might have stopped in the middle of a write
+                    if not line.endswith(b"\n"):
+                        break
+                    page = loadJson(line)
+                    self.pages += 1
+                    self.videos.extend(page["Videos"])
+                    self.continuationToken = page["ContinuationToken"]
+                    self.innertubeContext = tuple(page["InnertubeContext"])
+        except FileNotFoundError:
+            pass
+        return self.pages
+
+    def record(self, videos: list, continuationToken: str, innertubeContext: tuple):
+        with open(self.filePath, 'ab') as f:
+            f.write(dumpJsonLine({"Videos": videos, "ContinuationToken": continuationToken,
+                                  "InnertubeContext": innertubeContext}))
+        self.pages += 1
+
+    def discard(self):
+        try:
+            os.remove(self.filePath)
+        except FileNotFoundError:
+            pass
+
+
+class _Storage:
+    """
+        Base for the database backends a Collector saves channels to, one instance lives as long as the Collector
+        Videos go in and come out as the records the crawler produces, newest first
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+
+    def readChannel(self, channelName: str, channelID: str):
+        """
+            Stored videos of a channel, None if there are none
+        """
+        raise NotImplementedError
+
+    def readChannels(self, channels: list):
+        """
+            readChannel for several (channelName, channelID) pairs at once, keyed by channel ID
+        """
+        return {channelID: self.readChannel(channelName, channelID) for channelName, channelID in channels}
+
+    def writeChannel(self, channelName: str, channelID: str, data: list):
+        """
+            Save every video in data for the channel
+        """
+        raise NotImplementedError
+
+    def writeChannels(self, channels: list):
+        """
+            writeChannel for several (channelName, channelID, data) entries at once
+        """
+        for channelName, channelID, data in channels:
+            self.writeChannel(channelName, channelID, data)
+
+    def writeChanges(self, channelName: str, channelID: str, data: list, changedVideos: list, history: list = ()):
+        """
+            Save a channel after a diff. data is the whole merged list, changedVideos the records in it that changed
+            history holds the video_history rows of the changes (see historyRecord), only databases that keep them use it
+        """
+        self.writeChannel(channelName, channelID, data)
+
+    def writeHistory(self, channelName: str, channelID: str, history: list):
+        """
+            Record changes without saving any videos, for runs that don't append new data
+        """
+
+    def close(self):
+        pass
+
+
+class _JsonStorage(_Storage):
+    """
+        One VE_<name>.json file per channel, rewritten on every save
+    """
+
+    def filePath(self, channelName: str):
+        return f"{self.collector._JsonDatabaseBaseFilesPath + str(sanitize_filename(channelName))}.json"
+
+    def readChannel(self, channelName: str, channelID: str):
+        self.collector.print(3, f"Try to read Json for {channelName}")
+        try:
+            with open(self.filePath(channelName), 'r') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            self.collector.print(3, f"Json file not found for {channelName}")
+            return None
+        except json.decoder.JSONDecodeError:
+            self.collector.print(3, f"Error decoding Json for {channelName}")
+            return None
+
+    def writeChannel(self, channelName: str, channelID: str, data: list):
+        self.collector.print(3, f"Dumping to Json for {channelName}")
+        atomicWriteJson(self.filePath(channelName), data)
+
+
+class _JsonLinesStorage(_Storage):
+    """
+        One VE_<name>.jsonl file per channel, oldest first. Changes are appended and a later record for a video replaces the earlier one
+    """
+
+    def __init__(self, collector):
+        super().__init__(collector)
+        #lines in each file as of the last read or write, None when it needs compacting
+        self.recordCounts = {}
+
+    def filePath(self, channelName: str):
+        return f"{self.collector._JsonDatabaseBaseFilesPath + str(sanitize_filename(channelName))}.jsonl"
+
+    def readChannel(self, channelName: str, channelID: str):
+        self.collector.print(3, f"Try to read Json Lines for {channelName}")
+        filePath = self.filePath(channelName)
+        #videos are stored oldest first, a later record for the same video replaces the earlier one in place
+        videosByID = {}
+        recordCount = 0
+        try:
+            with open(filePath, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        self.collector.print(
+                            2, f"Ignoring an incomplete last record in Json Lines for {channelName}, the file is compacted on the next save")
+                        recordCount = None
+                        break
+                    video = loadJson(line)
+                    videosByID[videoIDFromLink(video["Link"])] = video
+                    recordCount += 1
+        except FileNotFoundError:
+            self.collector.print(3, f"Json Lines file not found for {channelName}")
+            return None
+        except ValueError:
+            self.collector.print(3, f"Error decoding Json Lines for {channelName}")
+            return None
+        self.recordCounts[filePath] = recordCount
+        if not videosByID:
+            return None
+        return list(reversed(videosByID.values()))
+
+    def writeChannel(self, channelName: str, channelID: str, data: list):
+        self.collector.print(3, f"Compacting Json Lines for {channelName}")
+        filePath = self.filePath(channelName)
+        atomicWriteJsonLines(filePath, reversed(data))
+        self.recordCounts[filePath] = len(data)
+
+    def writeChanges(self, channelName: str, channelID: str, data: list, changedVideos: list, history: list = ()):
+        """
+            Append changedVideos as new records, or compact the file to just data once most of its lines are outdated
+        """
+        filePath = self.filePath(channelName)
+        recordCount = self.recordCounts.get(filePath)
+        if recordCount is None or recordCount + len(changedVideos) > 2 * len(data):
+            self.writeChannel(channelName, channelID, data)
+            return
+        self.collector.print(
+            3, f"Appending {len(changedVideos)} records to Json Lines for {channelName}")
+        #one write call, oldest first like the rest of the file
+        with open(filePath, 'ab') as f:
+            f.write(b"".join(dumpJsonLine(video)
+                    for video in reversed(changedVideos)))
+        self.recordCounts[filePath] = recordCount + len(changedVideos)
+
+
+class _SQLiteStorage(_Storage):
+    """
+        all_data.sqlite over one connection that stays open for the whole run
+        The schema is checked once when it opens, and the connection's statement cache keeps the SQL below prepared between channels
+        Workers share the connection, every use of it is serialized
+    """
+
+    def __init__(self, collector):
+        super().__init__(collector)
+        self.filePath = collector._SQLDatabaseBaseFilePath + ".sqlite"
+        self._conn = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self):
+        #opened on first use, so runs that never touch SQLite don't create the file
+        with self._lock:
+            if self._conn is None:
+                self._conn = self.connect()
+            return self._conn
+
+    def connect(self):
+        """
+            Open the database in WAL mode, upgrading and checking its schema
+        """
+        conn = sqlite3.connect(self.filePath, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        #in KiB when negative
+        conn.execute("PRAGMA cache_size = -65536")
+        conn.execute("PRAGMA foreign_keys = ON")
+        self.migrate(conn)
+        self.runSqlSchema(conn)
+        return conn
+
+    def migrate(self, conn: sqlite3.Connection):
+        """
+            Bring a database made by an older version of the script up to _SqliteSchemaVersion
+            A copy of the old file is kept next to it before the first migration runs
+        """
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0:
+            #version 1 databases predate user_version, a new database has no tables at all
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'basic_video_data'").fetchone():
+                return
+            version = 1
+        if version >= _SqliteSchemaVersion:
+            return
+        backupFilePath = f"{self.collector._SQLDatabaseBaseFilePath}.v{version}.sqlite"
+        self.collector.print(
+            1, f"Upgrading SQLite database from version {version} to {_SqliteSchemaVersion}, a copy of the old one is saved at {backupFilePath}")
+        backup = sqlite3.connect(backupFilePath)
+        try:
+            conn.backup(backup)
+        finally:
+            backup.close()
+        conn.create_function("video_id", 1, videoIDFromLink, deterministic=True)
+        conn.create_function("parse_views", 1, parseViewCount, deterministic=True)
+        conn.create_function("parse_duration", 1, parseDuration, deterministic=True)
+        for targetVersion, migrationFileLocation in _SqliteMigrations:
+            if version >= targetVersion:
+                continue
+            self.collector.print(2, f"Running {path.basename(migrationFileLocation)}")
+            with open(migrationFileLocation, 'r') as f:
+                conn.executescript(f.read())
+            version = targetVersion
+
+    def runSqlSchema(self, conn: sqlite3.Connection):
+        """
+            Make sure database exists
+        """
+        self.collector.print(
+            3, "Making sure SQLite is correct format, running schema.sql commands")
+        with open(_SqliteSchemaFileLocation, 'r') as f:
+            conn.executescript(f.read())
+
+    def readChannel(self, channelName: str, channelID: str):
+        return self.readChannels([(channelName, channelID)])[channelID]
+
+    def readChannels(self, channels: list):
+        """
+            Stored videos of every channel in one query per 500 channels
+        """
+        channelIDs = [channelID for _, channelID in channels]
+        rowsByChannel = {channelID: [] for channelID in channelIDs}
+        with self._lock:
+            #stay well under SQLite's limit on bound parameters
+            for i in range(0, len(channelIDs), 500):
+                chunk = channelIDs[i:i + 500]
+                for channelID, title, videoID, views, duration, availability in self.conn.execute(
+                        "SELECT channel_id, video_title, video_id, video_views, video_duration, video_availability FROM video "
+                        f"WHERE channel_id IN ({', '.join('?' * len(chunk))}) ORDER BY video_key DESC", chunk):
+                    #same records the crawler produces, so stored and new data diff the same way for both databases
+                    rowsByChannel[channelID].append({"Title": title, "Link": _VideoLinkPrefix + videoID, "Views": formatViewCount(views),
+                                                     "Duration": formatDuration(duration), "Availability": bool(availability)})
+        for channelName, channelID in channels:
+            if not rowsByChannel[channelID]:
+                self.collector.print(3, f"SQLite database currently empty for {channelName}")
+                rowsByChannel[channelID] = None
+        self.collector.print(3, "Read data from SQLite database")
+        return rowsByChannel
+
+    def writeChannel(self, channelName: str, channelID: str, data: list):
+        self.writeVideos(channelName, channelID, data)
+
+    def writeChannels(self, channels: list):
+        """
+            Upsert every channel's videos in a single transaction
+        """
+        start = perf_counter()
+        rowsWritten = 0
+        with self._lock, self.conn as conn:
+            for channelName, channelID, data in channels:
+                rowsWritten += self.upsertChannel(conn, channelName, channelID, data)
+        self.collector.print(
+            2, f"Wrote {rowsWritten} rows to SQLite for {len(channels)} channels in {perf_counter() - start:.2f}s")
+
+    def writeChanges(self, channelName: str, channelID: str, data: list, changedVideos: list, history: list = ()):
+        #only the changed videos and their history rows, the rest of data is already stored
+        self.writeVideos(channelName, channelID, changedVideos, history)
+
+    def writeHistory(self, channelName: str, channelID: str, history: list):
+        if history:
+            self.writeVideos(channelName, channelID, [], history)
+
+    def writeVideos(self, channelName: str, channelID: str, videos: list, history: list = ()):
+        """
+            Insert or update videos and append their history rows in one transaction
+            videos are newest first like everywhere else, they are inserted oldest first so video_key follows upload order
+        """
+        start = perf_counter()
+        self.collector.print(3, f"Writing to SQLite for {channelName}")
+        with self._lock, self.conn as conn:
+            rowsWritten = self.upsertChannel(conn, channelName, channelID, videos)
+            if history:
+                conn.executemany(_InsertHistorySql, history)
+        self.collector.print(
+            2, f"Wrote {rowsWritten} rows to SQLite for {channelName} in {perf_counter() - start:.2f}s")
+
+    def upsertChannel(self, conn: sqlite3.Connection, channelName: str, channelID: str, videos: list):
+        conn.execute(_UpsertChannelSql, (channelID, channelName, ))
+        #video ids are unique, a video already stored (even under another channel) is updated in place
+        cursor = conn.executemany(_UpsertVideoSql, ((videoIDFromLink(video["Link"]), channelID, video.get("Title"), parseViewCount(video.get("Views")),
+                                                     parseDuration(video.get("Duration")), video.get("Availability", True))
+                                                    for video in reversed(videos)))
+        return cursor.rowcount
+
+    def insertNewVideos(self, channels):
+        """
+            Add (channelName, channelID, rows) entries from readVideoDatabaseFile in one transaction, keeping videos that are already stored as they are
+            Returns how many videos were read and how many of them were inserted
+        """
+        videosRead = videosInserted = 0
+        with self._lock, self.conn as conn:
+            knownVideoIDs = {videoID for videoID, in conn.execute(
+                "SELECT video_id FROM video")}
+            for channelName, channelID, rows in channels:
+                self.collector.print(2, f"Converting to SQL for {channelName}")
+                conn.execute(_UpsertChannelSql, (channelID, channelName, ))
+                newRows = []
+                for videoID, title, views, duration, availability in rows:
+                    if videoID not in knownVideoIDs:
+                        knownVideoIDs.add(videoID)
+                        newRows.append(
+                            (videoID, channelID, title, views, duration, availability))
+                conn.executemany(_InsertNewVideoSql, newRows)
+                videosRead += len(rows)
+                videosInserted += len(newRows)
+        return videosRead, videosInserted
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_StorageBackends = {"sqlite": _SQLiteStorage,
+                    "json": _JsonStorage, "jsonl": _JsonLinesStorage}
+
 
 class Collector:
-    def __init__(self, databaseType: str, databaseLocation: str, userAgent: str, minVerbosityPriority: int):
+    def __init__(self, databaseType: str, databaseLocation: str, userAgent: str, minVerbosityPriority: int, workers: int = 1, requestsPerSecond: float = 0,
+                 incrementalKnownRun: int = 0, fullScanInterval: float = 7, channelCacheTTL: float = 30, refreshChannels: bool = False, offline: bool = False,
+                 retries: int = 5, minPollHours: float = 1, maxPollHours: float = 168):
         assert databaseType in _SupportedDatabases, f"Supported database types are {_SupportedDatabases}"
         assert path.exists(databaseLocation), "Database location doesn't exist"
         self._JsonDatabaseBaseFilesPath = path.join(
@@ -32,45 +965,221 @@ class Collector:
             databaseLocation, "RE_")  # changelog data
         self._SQLDatabaseBaseFilePath = path.join(
             databaseLocation, "all_data")  # sqlite video data
+        self._CrawlStateFilePath = path.join(
+            databaseLocation, "crawl_state.json")  # per channel crawl bookkeeping
+        self._ChannelCacheFilePath = path.join(
+            databaseLocation, "channel_cache.json")  # resolved channel names and IDs
+        self._CrawlRunFilePath = path.join(
+            databaseLocation, "crawl_run.json")  # channels of the last run and how far it got
+        self._CheckpointDirPath = path.join(
+            databaseLocation, "checkpoints")  # pages fetched so far by unfinished channel crawls
+        self._SessionCookiesFilePath = path.join(
+            databaseLocation, "session_cookies.json")  # YouTube's cookies from the last run
         self.databaseType = databaseType
         self.minVerbosityPriority = minVerbosityPriority
+        self.workers = max(1, workers)
+        #incremental mode: stop crawling a channel after this many already indexed videos in a row (0 to always crawl everything)
+        self.incrementalKnownRun = incrementalKnownRun
+        #days between full crawls in incremental mode, removals are only detected by those
+        self.fullScanInterval = fullScanInterval
+        #days a resolved channel ID is reused before resolving it again (0 to always resolve)
+        self.channelCacheTTL = channelCacheTTL
+        self.refreshChannels = refreshChannels
+        self.rateLimiter = _RateLimiter(requestsPerSecond)
+        self.metrics = _Metrics()
+        #times a throttled, failed or captcha'd request is retried before giving up on it
+        self.retries = retries
+        #bounds of the time between two crawls of a channel in daemon mode, see schedulePoll
+        self.minPollInterval = minPollHours * 3600
+        self.maxPollInterval = max(minPollHours, maxPollHours) * 3600
+        #serializes database and changelog access between workers
+        self._databaseLock = threading.RLock()
+        #backend for databaseType, keeps its files or connection open until close()
+        self.storage = _StorageBackends[databaseType](self)
+        #Innertube client context (post data and parameters for youtubei/v1), shared by all channels
+        self.innertubeContext = None
+        self._innertubeLock = threading.Lock()
+        self.crawlState = self.readStateFile(self._CrawlStateFilePath)
+        self.channelCache = self.readStateFile(self._ChannelCacheFilePath)
+        #one session shared by all workers, with a connection pool big enough for all of them
         self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=self.workers, pool_maxsize=self.workers))
         #base header
         self.userAgent = userAgent
         self.session.headers.update({
             "user-agent": userAgent
         })
-        self.consent()
+        self.consented = False
+        #whether consent() visited the homepage in this run, rather than a saved session being reused
+        self.visitedHomepage = False
+        #bumped by every consent(), so workers that all got sent to the consent page only consent once
+        self._consentGeneration = 0
+        self._consentLock = threading.RLock()
+        #offline runs (like -cts) only consent if they end up needing the network
+        if not offline:
+            self.startSession()
+
+    def startSession(self):
+        """
+            Reuse the cookies saved by the last run, consent to YouTube only if there are none
+        """
+        if self.loadCookies():
+            self.print(1, "Reusing the saved YouTube session")
+            self.consented = True
+        else:
+            self.consent()
+
+    def loadCookies(self):
+        """
+            Put the unexpired cookies from session_cookies.json in the session, returns False if there are none or consent is still pending
+        """
+        savedCookies = self.readStateFile(self._SessionCookiesFilePath)
+        now = datetime.now().timestamp()
+        cookies = [cookie for cookie in savedCookies.get("Cookies", [])
+                   if cookie["expires"] is None or cookie["expires"] > now]
+        if not cookies or any(cookie["name"] == "CONSENT" and "PENDING" in cookie["value"] for cookie in cookies):
+            return False
+        for cookie in cookies:
+            self.session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"],
+                                     expires=cookie["expires"], secure=cookie["secure"], rest={"HttpOnly": cookie["httpOnly"]} if cookie["httpOnly"] else {})
+        return True
 
-    def consent(self):  # run once at start of bot
+    def saveCookies(self):
+        """
+            Save the session's cookies (CONSENT, SOCS, VISITOR_INFO1_LIVE and the like) so the next run can skip consent()
+        """
+        with self._consentLock:
+            cookies = [{"name": cookie.name, "value": cookie.value, "domain": cookie.domain, "path": cookie.path, "expires": cookie.expires,
+                        "secure": cookie.secure, "httpOnly": cookie.has_nonstandard_attr("HttpOnly")} for cookie in self.session.cookies]
+            atomicWriteJson(self._SessionCookiesFilePath, {
+                "Saved": datetime.now().isoformat(), "Cookies": cookies})
+
+    def consent(self):  # run once at start of bot, or when YouTube rejects the saved session
+        with self._consentLock:
+            self._consentGeneration += 1
+            self.visitHomepage()
+            self.saveCookies()
+
+    def visitHomepage(self):
         self.print(1, 'Consenting to YouTube...')
-        firstVisit = self.session.get("https://youtube.com")
+        self.consented = True
+        self.visitedHomepage = True
+        #straight through requestWithRetries, request() would treat the consent page as a rejected session
+        firstVisit = self.requestWithRetries("GET", "https://youtube.com", stream=True)
         # Check if consent needed
         consent_cookie = self.session.cookies.get("CONSENT", "")
         if "PENDING" in consent_cookie:
+            firstVisitContent = self.readPage(
+                firstVisit, (_SavePreferenceUrlBlob,))
             try:
                 # consent to youtube
                 # get consent link (first link in page since choice doesn't matter much)
-                consent_link = firstVisit.text.split('savePreferenceUrl":"')[1].split('"')[0]
-                # convert unicode to plaintext
-                consent_link = consent_link.encode().decode("unicode-escape")
-                resp = self.session.post(consent_link)
-                if resp.status_code != HTTPStatus.NO_CONTENT:
-                    self.print(1,
-                            "Could not consent to YouTube!")
-                    self.log_to_file("Error occured in Position -1, Consent link is {} with status {}\n\nHere is the response: {}\n\n".format(
-                        consent_link, resp.status_code, resp.text))
-                    quit()
+                consent_link = extractEmbeddedJson(
+                    firstVisitContent, *_SavePreferenceUrlBlob)
             except Exception as e:
-                self.print(1, e)
+                self.reportSiteFormatError("0", e, "Here are initial page details after first visit: {}\n\n".format(
+                    self.get_request_log(firstVisit, firstVisitContent)))
+            resp = self.requestWithRetries("POST", consent_link)
+            if resp.status_code != HTTPStatus.NO_CONTENT:
                 self.print(1,
-                           "YouTube might have changed site format. if re-running the script didn't work, contact me to update the code (position 0)\nCheck logs for more info")
-                detailed_error = traceback.format_exc()
-                self.log_to_file("Error occured in Position 0, here is detailed traceback:\n\n{}\n\nHere are initial page details after first visit: {}\n\n".format(
-                    detailed_error, self.get_request_log(firstVisit)))
-                quit()
+                           "Could not consent to YouTube!")
+                self.log_to_file("Error occured in Position -1, Consent link is {} with status {}\n\nHere is the response: {}\n\n".format(
+                    consent_link, resp.status_code, resp.text))
+                #raised instead of quitting, a worker re-consenting mid-run only fails its own channel
+                raise SiteFormatError(
+                    f"Couldn't consent to YouTube, status {resp.status_code}")
         else:
             self.print(1, "It seems consent is not required")
+            #the homepage carries the same client context as channel pages, keep it so channels don't need to scrape theirs
+            self.innertubeContext = self.tryInnertubeContext(
+                self.readPage(firstVisit, (_YtcfgBlob,)))
+
+    def request(self, method: str, url: str, **kwargs):
+        """
+            session.request through the rate limiter, see requestWithRetries
+            Being sent to the consent page means YouTube rejected the session's cookies, consent again and send the request once more
+        """
+        consentGeneration = self._consentGeneration
+        response = self.requestWithRetries(method, url, **kwargs)
+        if isConsentUrl(response.url):
+            response.close()
+            self.consentAgain(consentGeneration)
+            response = self.requestWithRetries(method, url, **kwargs)
+        return response
+
+    def consentAgain(self, consentGeneration: int):
+        """
+            consent() after a request sent at consentGeneration was redirected to the consent page
+        """
+        with self._consentLock:
+            #another worker might have consented again already
+            if self._consentGeneration == consentGeneration:
+                self.print(1, "YouTube rejected the saved session")
+                self.consent()
+
+    def requestWithRetries(self, method: str, url: str, **kwargs):
+        """
+            Retry 429/5xx responses, captcha redirects and connection errors with backoff
+            The last response is returned as it is once the retries run out
+        """
+        for attempt in range(self.retries + 1):
+            self.rateLimiter.wait()
+            start = perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.metrics.countRequest(url, perf_counter() - start)
+                if attempt == self.retries:
+                    raise
+                reason, delay = e, retryDelay(attempt)
+            else:
+                self.metrics.countRequest(url, perf_counter() - start)
+                if not kwargs.get("stream"):
+                    #streamed bodies are counted by readPage
+                    self.metrics.add("bytes", len(response.content))
+                throttled = response.status_code in _ThrottleStatuses or isCaptchaUrl(response.url)
+                if not throttled and response.status_code not in _RetryStatuses:
+                    self.rateLimiter.succeeded()
+                    return response
+                if attempt == self.retries:
+                    return response
+                retryAfter = parseRetryAfter(response.headers.get("Retry-After"))
+                if throttled:
+                    self.metrics.add("throttled")
+                    self.rateLimiter.throttled(retryAfter)
+                reason, delay = f"status {response.status_code} from {response.url}", retryDelay(attempt, retryAfter)
+                response.close()
+            self.print(
+                2, f"Request to {url} failed ({reason}), retry {attempt + 1}/{self.retries} in {delay:.1f}s")
+            self.metrics.add("retries")
+            sleep(delay)
+
+    def requestPage(self, method: str, url: str, blobs: tuple = (), **kwargs):
+        """
+            Download a page as raw bytes, returns the response and its content
+            With blobs ((marker, terminator) pairs) the download stops as soon as all of them have arrived
+        """
+        response = self.request(method, url, stream=True, **kwargs)
+        return response, self.readPage(response, blobs)
+
+    def readPage(self, response: requests.Response, blobs: tuple = ()):
+        """
+            Read the content of a streamed response, see requestPage
+        """
+        start = perf_counter()
+        content = bytearray()
+        scans = [[marker, terminator, -1, 0] for marker, terminator in blobs]
+        for chunk in response.iter_content(chunk_size=65536):
+            content += chunk
+            if scans and _embeddedBlobsComplete(content, scans):
+                self.print(
+                    4, f"Got everything needed from {response.url} after {len(content)} bytes")
+                break
+        response.close()
+        self.metrics.addTime(requestKind(response.url), perf_counter() - start)
+        self.metrics.add("bytes", len(content))
+        return bytes(content)
 
     def print(self, verbosityPriority: int, object):
         if verbosityPriority <= self.minVerbosityPriority:
@@ -78,12 +1187,14 @@ class Collector:
 
     def log_to_file(self, data: str):
         logname = datetime.now().strftime("error_log_%H_%M_%d_%m_%Y.log")
-        with open(path.join(_ScriptPath, logname), 'w') as f:
+        with open(path.join(_ScriptPath, logname), 'a') as f:
             f.write(data)
 
-    def get_request_log(self, request: requests.Response):
+    def get_request_log(self, request: requests.Response, content: bytes = None):
+        #content is the part of a streamed page that was downloaded
+        pageText = request.text if content is None else content.decode("utf-8", "replace")
         logData = "Final page text(url '{}', status {}): \n\n{}\n\nFinal page headers:\n\n{}\n\n".format(
-            request.url, request.status_code, request.text, json.dumps(request.headers.__dict__))
+            request.url, request.status_code, pageText, json.dumps(request.headers.__dict__))
         logData += "Page history:"
         for i, hist in enumerate(request.history):
             logData += "\n\n---Item {}\n\n".format(str(i+1))
@@ -91,286 +1202,235 @@ class Collector:
                 hist.url, hist.status_code, hist.text, json.dumps(hist.headers.__dict__))
         return logData
 
-    def convertJSONtoSQLite(self, name: str):
-        result = self.searchForChannelName(name)
-        if not result:
-            self.print(1, f"No channel by such name, ignoring for {name}")
-            return None
-        channelName, channelID = result
-        data = None
-        if path.exists(self._SQLDatabaseBaseFilePath + ".sqlite"):
-            self.print(
-                1, f"Database file at {str(self._SQLDatabaseBaseFilePath) + '.sqlite'} already exists. appending that data too to prevent losses..")
-            self.databaseType = "sqlite"
-            data = self.readBasicDataFromDB(channelName, channelID)
-        #set dtype as json first
-        self.databaseType = "json"
-        #previous sql data exists. append new data to prevent loss
-        if data:
-            jsonData = self.readBasicDataFromDB(channelName, channelID)
-            #append json data to sqlite data
-            for jEach in jsonData:
-                append = True
-                for sEach in data:
-                    #unique element already exists in sql data
-                    if jEach["Link"] == sEach["Link"]:
-                        append = False
-                        break
-                if append:
-                    self.print(
-                        1, f"Appending video '{jEach['Title']}' to new data, as it wasn't there before")
-                    data.append(jEach)
+    def convertJSONtoSQLite(self, channelNames: list = None):
+        """
+            Load VE_ Json and Json Lines files into the SQLite database in one transaction
+            Without channelNames every VE_ file in the database location is converted, channel IDs come from the channel cache
+            Videos already in SQLite are kept as they are, only new video ids are inserted
+        """
+        start = perf_counter()
+        databaseLocation = path.dirname(self._JsonDatabaseBaseFilesPath)
+        filePrefix = path.basename(self._JsonDatabaseBaseFilesPath)
+        jsonFiles = {}
+        for fileName in sorted(os.listdir(databaseLocation)):
+            stem, extension = path.splitext(fileName)
+            if fileName.startswith(filePrefix) and extension in (".json", ".jsonl"):
+                sanitizedChannelName = stem[len(filePrefix):]
+                #a channel's Json Lines file is newer than its Json one if both exist
+                if extension == ".jsonl" or sanitizedChannelName not in jsonFiles:
+                    jsonFiles[sanitizedChannelName] = path.join(
+                        databaseLocation, fileName)
+        channels = {}
+        unresolved = []
+        if channelNames:
+            #only names missing from the cache need a session and a search
+            for name in channelNames:
+                cached = self.cachedChannel(name)
+                if cached:
+                    channels[str(sanitize_filename(cached[0]))] = cached
+                else:
+                    unresolved.append(name)
         else:
-            data = self.readBasicDataFromDB(channelName, channelID)
-        if not data:
+            cachedChannels = {str(sanitize_filename(cached["ChannelName"])): (cached["ChannelName"], cached["ChannelID"])
+                              for cached in self.channelCache.values()}
+            for sanitizedChannelName in jsonFiles:
+                if sanitizedChannelName in cachedChannels:
+                    channels[sanitizedChannelName] = cachedChannels[sanitizedChannelName]
+                else:
+                    unresolved.append(sanitizedChannelName)
+        discovered = not channelNames
+        if unresolved and not self.consented:
             self.print(
-                2, f"No valid database for channel, ignoring for {channelName}")
-            return None
-        self.print(2, f"Converting to SQL for {channelName}")
-        #set dtype as sql for saving
-        self.databaseType = "sqlite"
-        self.writeBasicDataToDB(channelName, channelID, data)
+                1, f"{len(unresolved)} channel(s) aren't in the channel cache, searching for them")
+            self.startSession()
+        for name in unresolved:
+            result = self.resolveChannel(name)
+            if not result:
+                self.print(1, f"No channel by such name, ignoring for {name}")
+                continue
+            #a discovered file stays keyed by its own name, the search might return a renamed channel or another top result
+            channels[name if discovered else str(sanitize_filename(result[0]))] = result
+        work = [(jsonFiles[sanitizedChannelName], channelName, channelID)
+                for sanitizedChannelName, (channelName, channelID) in channels.items() if sanitizedChannelName in jsonFiles]
+        for sanitizedChannelName, (channelName, _) in channels.items():
+            if sanitizedChannelName not in jsonFiles:
+                self.print(
+                    2, f"No valid database for channel, ignoring for {channelName}")
+        if not work:
+            self.print(1, "Nothing to convert")
+            return
+        self.print(1, f"Converting {len(work)} Json databases to SQLite")
+        filePaths = [filePath for filePath, _, _ in work]
+        #parsing is CPU bound, spread it over processes when there are enough files
+        if self.workers > 1 and len(filePaths) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                parsedFiles = list(executor.map(
+                    tryReadVideoDatabaseFile, filePaths, chunksize=max(1, len(filePaths) // (self.workers * 4))))
+        else:
+            parsedFiles = list(map(tryReadVideoDatabaseFile, filePaths))
+        parseTime = perf_counter() - start
+        #a corrupt file skips its channel, the others are still converted
+        converted = []
+        for (filePath, channelName, channelID), (rows, error) in zip(work, parsedFiles):
+            if error is None:
+                converted.append((channelName, channelID, rows))
+            else:
+                self.print(1, f"Error decoding Json for {channelName}, skipping {path.basename(filePath)} ({error})")
+        skipped = len(work) - len(converted)
+        #-f json runs convert into a SQLite database of their own
+        storage = self.storage if isinstance(
+            self.storage, _SQLiteStorage) else _SQLiteStorage(self)
+        try:
+            videosRead, videosInserted = storage.insertNewVideos(converted)
+        finally:
+            if storage is not self.storage:
+                storage.close()
+        elapsed = perf_counter() - start
+        self.print(1, f"Converted {len(converted)} channels in {elapsed:.2f}s ({parseTime:.2f}s parsing): {videosRead} videos read, {videosInserted} inserted, "
+                   f"{videosRead - videosInserted} already stored, {videosRead / elapsed:.0f} videos/s" + (f", {skipped} unreadable file(s) skipped" if skipped else ""))
+
+    def readBasicDataFromDB(self, channelName: str, channelID: str):
+        return self.storage.readChannel(channelName, channelID)
 
-    def runSqlSchema(self, SqlCursor: sqlite3.Cursor):
+    def writeBasicDataToDB(self, channelName: str, channelID: str, data: list):
         """
-            Make sure database exists
+            Save every video in data for the channel. Json replaces the file, SQLite upserts so history rows are kept
         """
-        self.print(
-            3, "Making sure SQLite is correct format, running schema.sql commands")
-        with open(_SqliteSchemaFileLocation, 'r') as f:
-            commands = f.read()
-            SqlCursor.executescript(commands)
+        self.storage.writeChannel(channelName, channelID, data)
 
-    def readBasicDataFromDB(self, channelName: str, channelID: str):
-        sanitizedChannelName = str(sanitize_filename(channelName))
-        if self.databaseType == "json":
-            self.print(3, f"Try to read Json for {channelName}")
-            try:
-                with open(f"{self._JsonDatabaseBaseFilesPath + sanitizedChannelName}.json", 'r') as f:
-                    videoData = json.loads(f.read())
-                    return videoData
-            except FileNotFoundError:
-                self.print(3, f"Json file not found for {channelName}")
-                return None
-            except json.decoder.JSONDecodeError:
-                self.print(3, f"Error decoding Json for {channelName}")
-                return None
-        elif self.databaseType == "sqlite":
-            self.print(3, "Connecting to SQL database")
-            conn = sqlite3.connect(self._SQLDatabaseBaseFilePath + ".sqlite")
-            cursor = conn.cursor()
-            self.runSqlSchema(cursor)
-            cursor.execute(
-                "SELECT video_title, video_link, video_views, video_duration, video_availability FROM basic_video_data WHERE channel_id = ?", (channelID, ))
-            data = cursor.fetchall()
-            if not data:
-                self.print(3, "SQLite database currently empty")
-                return None
-            videoData = []
-            dataKeys = ["Title", "Link", "Views", "Duration", "Availability"]
-            for dataValues in data:
-                videoData.append(dict(zip(dataKeys, dataValues)))
-            self.print(3, f"Read data from SQLite database")
-            conn.close()
-            return videoData
-
-    def writeBasicDataToDB(self, channelName: str, channelID: str, data: dict):
-        sanitizedChannelName = str(sanitize_filename(channelName))
-        if self.databaseType == "json":
-            self.print(3, f"Dumping to Json for {channelName}")
-            with open(f"{self._JsonDatabaseBaseFilesPath + sanitizedChannelName}.json", 'w') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-        elif self.databaseType == "sqlite":
-            self.print(3, "Connecting to SQLite database")
-            conn = sqlite3.connect(self._SQLDatabaseBaseFilePath + ".sqlite")
-            cursor = conn.cursor()
-            self.runSqlSchema(cursor)
-            #delete previous data
-            cursor.execute(
-                "DELETE FROM channel WHERE channel_id = ?", (channelID, ))
-            #write channel data
-            cursor.execute(
-                "INSERT INTO channel (channel_id, channel_name) VALUES (?, ?)", (channelID, channelName, ))
-            #write video data
-            self.print(3, f"Writing to SQLite for {channelName}")
-            for video in data:
-                try:
-                    videoLink, videoTitle, videoViews, videoDuration, videoAvailability = video.get("Link"), video.get(
-                        "Title"), video.get("Views"), video.get("Duration"), video.get("Availability", 1)
-                    cursor.execute("INSERT INTO basic_video_data (video_title, video_link, video_views, video_duration, video_availability, channel_id) VALUES (?, ?, ?, ?, ?, ?)",
-                                   (videoTitle, videoLink, videoViews, videoDuration, videoAvailability, channelID, ))
-                except sqlite3.IntegrityError as integrityError:
-                    if str(integrityError) == "UNIQUE constraint failed: basic_video_data.video_link":
-                        self.print(
-                            1, f"Video with link {videoLink} already in database, removing old data as links should be unique")
-                        #remove old stuff
-                        cursor.execute(
-                            "DELETE FROM basic_video_data WHERE video_link = ?", (videoLink, ))
-                        #insert current stuff
-                        cursor.execute("INSERT INTO basic_video_data (video_title, video_link, video_views, video_duration, video_availability, channel_id) VALUES (?, ?, ?, ?, ?, ?)",
-                                       (videoTitle, videoLink, videoViews, videoDuration, videoAvailability, channelID, ))
-                        continue
-                    raise integrityError
-            conn.commit()
-            conn.close()
+    def close(self):
+        self.storage.close()
+        if self.consented:
+            #keep cookies YouTube updated during the run for the next one
+            self.saveCookies()
+        self.session.close()
+
+    def reportSiteFormatError(self, position: str, error: Exception, details: str):
+        """
+            Report a page that couldn't be parsed and raise SiteFormatError, details are appended to the error log
+        """
+        self.print(1, error)
+        self.print(1,
+                   f"YouTube might have changed site format. if re-running the script didn't work, contact me to update the code (position {position})\nCheck logs for more info")
+        detailed_error = traceback.format_exc()
+        self.log_to_file("Error occured in Position {}, here is detailed traceback:\n\n{}\n\n{}".format(
+            position, detailed_error, details))
+        raise SiteFormatError(
+            f"Couldn't parse YouTube's response at position {position}: {error}") from error
+
+    def parseChannelSearch(self, page: bytes):
+        initialDataJson = extractEmbeddedJson(page, *_YtInitialDataBlob)
+        results = initialDataJson[
+            "contents"][
+            "twoColumnSearchResultsRenderer"][
+            "primaryContents"][
+            "sectionListRenderer"]["contents"][0]["itemSectionRenderer"]["contents"]
+        self.print(4, f"Search results:\n{json.dumps(results)}")
+        channelDetails = None
+        #look for channel ID in results
+        #forced to use loop for check because output has no specific order
+        for result in results:
+            if "channelRenderer" in result:
+                channelDetails = result["channelRenderer"]
+                break
+        if not channelDetails:
+            return None
+        self.print(4, f"Top result details:\n{json.dumps(channelDetails)}")
+        channelID = channelDetails["channelId"]
+        channelName = channelDetails["title"]["simpleText"]
+        self.print(
+            3, f"Found channel with name '{channelName}', ID '{channelID}'")
+        return channelName, channelID
 
     def searchForChannelName(self, name: str):
         self.print(3, f"Searching YouTube for {name}")
-        searchedPage = self.session.get(
-            f"https://www.youtube.com/results?search_query={name}")
+        searchedPage, searchedPageContent = self.requestPage(
+            "GET", f"https://www.youtube.com/results?search_query={name}", (_YtInitialDataBlob,))
         try:
-            initialDataJson = json.loads(searchedPage.text.split(
-                'ytInitialData = ')[1].split(';</script>')[0])
-            results = initialDataJson[
-                "contents"][
-                "twoColumnSearchResultsRenderer"][
-                "primaryContents"][
-                "sectionListRenderer"]["contents"][0]["itemSectionRenderer"]["contents"]
-            self.print(4, f"Search results:\n{json.dumps(results)}")
-            channelDetails = None
-            #look for channel ID in results
-            #forced to use loop for check because output has no specific order
-            for result in results:
-                if "channelRenderer" in result:
-                    channelDetails = result["channelRenderer"]
-                    break
-            if not channelDetails:
-                return None
-            self.print(4, f"Top result details:\n{json.dumps(channelDetails)}")
-            channelID = channelDetails["channelId"]
-            channelName = channelDetails["title"]["simpleText"]
-            self.print(
-                3, f"Found channel with name '{channelName}', ID '{channelID}'")
-            return channelName, channelID
+            return self.parseChannelSearch(searchedPageContent)
         except Exception as e:
-            self.print(1, e)
-            self.print(1,
-                       "YouTube might have changed site format. if re-running the script didn't work, contact me to update the code (position 1)\nCheck logs for more info")
-            detailed_error = traceback.format_exc()
-            self.log_to_file("Error occured in Position 1, here is detailed traceback:\n\n{}\n\nHere is page data for initial channel name search:\n\n{}".format(
-                detailed_error, self.get_request_log(searchedPage)))
-            quit()
+            self.reportSiteFormatError("1", e, "Here is page data for initial channel name search:\n\n{}".format(
+                self.get_request_log(searchedPage, searchedPageContent)))
     #results is a list
 
-    def recursiveVideosExtraction(self, videoList: list, postData: dict, postParametes: dict, videoData: dict, current: int = 1):
-        self.print(2, f"Getting video list {current}")
-        try:
-            #these two sometimes dont exist
-            views = "NaN"
-            length = "NaN"
-            #assume no more videos exist at first
-            continuationToken = None
-            for video in videoList:
-                if "continuationItemRenderer" in video:
-                    continuationToken = video["continuationItemRenderer"]["continuationEndpoint"]["continuationCommand"]["token"]
-                    self.print(
-                        3, f"More videos exist, continuation token is {continuationToken}")
-                    continue
-                videoID = video["richItemRenderer"]["content"]["videoRenderer"]["videoId"]
-                title = video["richItemRenderer"]["content"]["videoRenderer"]["title"]["runs"][0]["text"]
-                try:
-                    views = video["richItemRenderer"]["content"]["videoRenderer"]["viewCountText"]["simpleText"]
-                except:
-                    self.print(3, f"No views in data for {title}, setting NaN")
-                    pass
-                try:
-                    length = video["richItemRenderer"]["content"]["videoRenderer"]["thumbnailOverlays"][0]["thumbnailOverlayTimeStatusRenderer"]["text"]["simpleText"]
-                except:
-                    self.print(
-                        3, f"No video length in data for {title}, setting NaN")
-                    pass
-                videoData.append(
-                    {"Title": title, "Link": f"https://www.youtube.com/watch?v={videoID}", "Views": views, "Duration": length, "Availability": True})
-        except Exception as e:
-            self.print(1, e)
-            self.print(1,
-                       "YouTube might have changed site format. if re-running the script didn't work, contact me to update the code (position 3.1)\nCheck logs for more info")
-            detailed_error = traceback.format_exc()
-            self.log_to_file("Error occured in Position 3.1, here is detailed traceback:\n\n{}\n\nVideo list:\n\n{}\n\nVideo data:\n\n{}".format(
-                detailed_error, json.dumps(videoList), json.dumps(videoData)))
-            quit()
-        # if no more exists exit function
-        if not continuationToken:
-            self.print(2, "No more videos exist")
-            return
-        # ask for more videos
-        postData["continuation"] = continuationToken
-        self.print(3, "Getting next page")
-        videoListPage = self.session.post(
-            "https://www.youtube.com/youtubei/v1/browse", headers={}, params=postParametes, data=json.dumps(postData))
-        try:
-            nextJsonData = json.loads(videoListPage.text)
-            nextVideoList = nextJsonData["onResponseReceivedActions"][0][
-                "appendContinuationItemsAction"]["continuationItems"]
-        except Exception as e:
-            self.print(1, e)
-            self.print(1,
-                       "YouTube might have changed site format. if re-running the script didn't work, contact me to update the code (position 3.2)\nCheck logs for more info")
-            detailed_error = traceback.format_exc()
-            self.log_to_file("Error occured in Position 3.2, here is detailed traceback:\n\n{}\n\nHere is video list page log:\n\n{}".format(
-                detailed_error, self.get_request_log(videoListPage)))
-            quit()
-        self.recursiveVideosExtraction(
-            nextVideoList, postData, postParametes, videoData, current+1)
-
-    #get all video data in formatted form, saves to file at script location
-    def getVideos(self, channelID: str):
-        initialVideoPage = self.session.get(
-            f"https://www.youtube.com/channel/{channelID}/videos")
-        try:
-            initialRequestDataJson = json.loads(
-                '{' + initialVideoPage.text.split("ytcfg.set({")[1].split("); window.ytcfg.obfuscatedData")[0])
-            self.print(
-                4, f"Initial request json data: \n{json.dumps(initialRequestDataJson)}")
-        except Exception as e:
-            self.print(1, e)
-            self.print(1,
-                       "YouTube might have changed site format. if re-running the script didn't work, contact me to update the code (position 2.1)\nCheck logs for more info")
-            detailed_error = traceback.format_exc()
-            self.log_to_file("Error occured in Position 2.1, here is detailed traceback:\n\n{}\n\nHere is the initial get videos page log:\n\n{}".format(
-                detailed_error, self.get_request_log(initialVideoPage)))
-            quit()
-        # Get post data and parameters
-        try:
-            APIkey = initialRequestDataJson["INNERTUBE_API_KEY"]
-            clientData = initialRequestDataJson["INNERTUBE_CONTEXT"]["client"]
-            hl = clientData["hl"]
-            gl = clientData["gl"]
-            visitorData = clientData["visitorData"]
-            clientName = clientData["clientName"]
-            clientVer = clientData["clientVersion"]
-            self.print(
-                3, f"Post Parameters:\n\tAPI key: {APIkey}\nPost Data:\n\thl: {hl}\n\tgl: {gl}\n\tVisitor data: {visitorData}\n\tClient name: {clientName}\n\tClient ver: {clientVer}")
-        except Exception as e:
-            self.print(1, e)
-            self.print(1,
-                       "YouTube might have changed site format. if re-running the script didn't work, contact me to update the code (position 2.2)\nCheck logs for more info")
-            detailed_error = traceback.format_exc()
-            self.log_to_file("Error occured in Position 2.2, here is detailed traceback:\n\n{}\n\nHere is the initial get videos page log:\n\n{}".format(
-                detailed_error, self.get_request_log(initialVideoPage)))
-            quit()
-        self.print(2, "Gotten tokens")
-
-        # final video data list
-        finalVideoData = []
-        # get first page of videos
+    def parseChannelPage(self, page: bytes):
+        initialDataJson = extractEmbeddedJson(page, *_YtInitialDataBlob)
+        channelDetails = initialDataJson["metadata"]["channelMetadataRenderer"]
+        self.print(4, f"Channel details:\n{json.dumps(channelDetails)}")
+        channelID = channelDetails["externalId"]
+        channelName = channelDetails["title"]
+        self.print(
+            3, f"Found channel with name '{channelName}', ID '{channelID}'")
+        return channelName, channelID
+
+    def lookupChannelPage(self, url: str):
+        self.print(3, f"Looking up channel page {url}")
+        channelPage, channelPageContent = self.requestPage(
+            "GET", url, (_YtInitialDataBlob,))
+        if channelPage.status_code == HTTPStatus.NOT_FOUND:
+            return None
         try:
-            initialVideoDataJson = json.loads(initialVideoPage.text.split(
-                'ytInitialData = ')[1].split(';</script>')[0])
-            initialVideoList = initialVideoDataJson["contents"][
-                "twoColumnBrowseResultsRenderer"]["tabs"][1][
-                "tabRenderer"]["content"]["richGridRenderer"]["contents"]
-            self.print(
-                4, f"Initial video list:\n{json.dumps(initialVideoList)}")
+            return self.parseChannelPage(channelPageContent)
         except Exception as e:
-            self.print(1, e)
-            self.print(1,
-                       "YouTube might have changed site format. if re-running the script didn't work, contact me to update the code (position 2.3)\nCheck logs for more info")
-            detailed_error = traceback.format_exc()
-            self.log_to_file("Error occured in Position 2.3, here is detailed traceback:\n\n{}\n\nHere is the initial get videos page log:\n\n{}".format(
-                detailed_error, self.get_request_log(initialVideoPage)))
-            quit()
+            self.reportSiteFormatError("1.1", e, "Here is the channel page log:\n\n{}".format(
+                self.get_request_log(channelPage, channelPageContent)))
+
+    def cachedChannel(self, name: str):
+        """
+            (channelName, channelID) for name from the channel cache, None if it isn't cached or the entry is too old
+        """
+        name = name.strip()
+        cached = self.channelCache.get(name.casefold())
+        if cached and not self.refreshChannels and \
+                (datetime.now() - datetime.fromisoformat(cached["Resolved"])).total_seconds() < self.channelCacheTTL * 86400:
+            self.print(3, f"Using cached channel ID '{cached['ChannelID']}' for {name}")
+            return cached["ChannelName"], cached["ChannelID"]
+        return None
+
+    def resolveChannel(self, name: str):
+        """
+            Map a creator name, @handle or UC... channel ID to (channelName, channelID)
+            Results are kept in channel_cache.json, so steady-state runs make no search requests at all
+        """
+        name = name.strip()
+        cacheKey = name.casefold()
+        cached = self.cachedChannel(name)
+        if cached:
+            return cached
+        if _ChannelIDPattern.match(name):
+            result = self.lookupChannelPage(
+                f"https://www.youtube.com/channel/{name}")
+        elif name.startswith("@"):
+            result = self.lookupChannelPage(f"https://www.youtube.com/{name}")
+        else:
+            result = self.searchForChannelName(name)
+        if result:
+            channelName, channelID = result
+            with self._databaseLock:
+                self.channelCache[cacheKey] = {
+                    "ChannelName": channelName, "ChannelID": channelID, "Resolved": datetime.now().isoformat()}
+                atomicWriteJson(self._ChannelCacheFilePath, self.channelCache)
+        return result
 
+    def parseInnertubeConfig(self, page: bytes):
+        initialRequestDataJson = extractEmbeddedJson(page, *_YtcfgBlob)
+        self.print(
+            4, f"Initial request json data: \n{json.dumps(initialRequestDataJson)}")
+        return initialRequestDataJson
+
+    def buildContinuationRequest(self, initialRequestDataJson: dict):
+        """
+            Build the base post data and parameters for youtubei/v1/browse from the page's ytcfg data
+        """
+        APIkey = initialRequestDataJson["INNERTUBE_API_KEY"]
+        clientData = initialRequestDataJson["INNERTUBE_CONTEXT"]["client"]
+        hl = clientData["hl"]
+        gl = clientData["gl"]
+        visitorData = clientData["visitorData"]
+        clientName = clientData["clientName"]
+        clientVer = clientData["clientVersion"]
+        self.print(
+            3, f"Post Parameters:\n\tAPI key: {APIkey}\nPost Data:\n\thl: {hl}\n\tgl: {gl}\n\tVisitor data: {visitorData}\n\tClient name: {clientName}\n\tClient ver: {clientVer}")
         # subsequent base post data
         postData = {
             "context": {
@@ -387,120 +1447,563 @@ class Collector:
         postParameters = {
             "key": APIkey
         }
-        self.recursiveVideosExtraction(
-            initialVideoList, postData, postParameters, finalVideoData)
-        return finalVideoData
+        return postData, postParameters
+
+    def tryInnertubeContext(self, page: bytes):
+        """
+            Client context from any page with ytcfg data, None if it isn't there or is incomplete
+        """
+        try:
+            postData, postParameters = self.buildContinuationRequest(
+                self.parseInnertubeConfig(page))
+        except Exception as e:
+            self.print(3, f"No usable Innertube client context in page ({e})")
+            return None
+        if not postParameters["key"] or not all(postData["context"]["client"].values()):
+            self.print(3, "Innertube client context in page is incomplete")
+            return None
+        return postData, postParameters
+
+    def getInnertubeContext(self, stale: tuple = None):
+        """
+            Session-wide Innertube client context, scraped once from the homepage
+            Pass the context YouTube just rejected as stale to get a fresh one, returns None if none could be found
+        """
+        with self._innertubeLock:
+            if self.innertubeContext is None or self.innertubeContext is stale:
+                self.print(2, "Getting Innertube client context")
+                _, homePageContent = self.requestPage(
+                    "GET", "https://www.youtube.com", (_YtcfgBlob,))
+                self.innertubeContext = self.tryInnertubeContext(
+                    homePageContent)
+            return self.innertubeContext
+
+    def parseVideoGrid(self, browseData: dict):
+        """
+            The richGridRenderer items of the videos tab, from either ytInitialData or a browse response
+        """
+        for tab in browseData["contents"]["twoColumnBrowseResultsRenderer"]["tabs"]:
+            tabContent = tab.get("tabRenderer", {}).get("content", {})
+            if "richGridRenderer" in tabContent:
+                videoList = tabContent["richGridRenderer"]["contents"]
+                self.print(
+                    4, f"Initial video list:\n{json.dumps(videoList)}")
+                return videoList
+        raise KeyError("No tab with a richGridRenderer")
+
+    def parseInitialVideoList(self, page: bytes):
+        initialVideoDataJson = extractEmbeddedJson(page, *_YtInitialDataBlob)
+        return self.parseVideoGrid(initialVideoDataJson)
+
+    def browseArguments(self, innertubeContext: tuple, channelID: str = None, continuationToken: str = None):
+        """
+            Request arguments for youtubei/v1/browse: either a channel's first page of videos or the page behind a continuation token
+        """
+        postData, postParameters = innertubeContext
+        if continuationToken:
+            postData = dict(postData, continuation=continuationToken)
+        else:
+            postData = dict(postData, browseId=channelID,
+                            params=_VideosTabParams)
+        return {"params": postParameters, "data": json.dumps(postData)}
+
+    def browse(self, innertubeContext: tuple, channelID: str = None, continuationToken: str = None):
+        return self.request(
+            "POST", "https://www.youtube.com/youtubei/v1/browse", headers={}, **self.browseArguments(innertubeContext, channelID, continuationToken))
+
+    def browseFirstVideoPage(self, channelID: str, innertubeContext: tuple):
+        """
+            First page of a channel's videos straight from youtubei/v1/browse, None if YouTube didn't accept the request
+        """
+        if innertubeContext is None:
+            return None
+        videoListPage = self.browse(innertubeContext, channelID)
+        if videoListPage.status_code != HTTPStatus.OK:
+            self.print(
+                2, f"Browsing first page of videos failed with status {videoListPage.status_code}")
+            return None
+        try:
+            with self.metrics.phase("parse"):
+                return self.parseVideoGrid(loadJson(videoListPage.content))
+        except Exception as e:
+            self.print(2, f"Couldn't read first page of videos from browse response ({e})")
+            return None
+
+    def scrapeVideosPage(self, channelID: str):
+        """
+            Fallback for the first page: the channel's whole /videos HTML, also refreshes the session's client context
+        """
+        initialVideoPage, initialVideoPageContent = self.requestPage(
+            "GET", f"https://www.youtube.com/channel/{channelID}/videos", (_YtcfgBlob, _YtInitialDataBlob))
+        try:
+            initialRequestDataJson = self.parseInnertubeConfig(
+                initialVideoPageContent)
+        except Exception as e:
+            self.reportSiteFormatError("2.1", e, "Here is the initial get videos page log:\n\n{}".format(
+                self.get_request_log(initialVideoPage, initialVideoPageContent)))
+        # Get post data and parameters
+        try:
+            innertubeContext = self.buildContinuationRequest(
+                initialRequestDataJson)
+        except Exception as e:
+            self.reportSiteFormatError("2.2", e, "Here is the initial get videos page log:\n\n{}".format(
+                self.get_request_log(initialVideoPage, initialVideoPageContent)))
+        with self._innertubeLock:
+            self.innertubeContext = innertubeContext
+        # get first page of videos
+        try:
+            videoList = self.parseInitialVideoList(initialVideoPageContent)
+        except Exception as e:
+            self.reportSiteFormatError("2.3", e, "Here is the initial get videos page log:\n\n{}".format(
+                self.get_request_log(initialVideoPage, initialVideoPageContent)))
+        return innertubeContext, videoList
+
+    def parseVideoList(self, videoList: list):
+        """
+            Extract video records from one page of richGridRenderer items
+            Returns the records and the continuation token for the next page (None on the last page)
+        """
+        videoData, continuationToken, incomplete = parseVideoItems(videoList)
+        if continuationToken:
+            self.print(
+                3, f"More videos exist, continuation token is {continuationToken}")
+        #only build the messages when they are shown
+        if incomplete and self.minVerbosityPriority >= 3:
+            for title in incomplete:
+                self.print(3, f"No views or video length in data for {title}, setting NaN")
+        return videoData, continuationToken
+
+    def parseContinuationPage(self, page: bytes):
+        nextJsonData = loadJson(page)
+        return nextJsonData["onResponseReceivedActions"][0][
+            "appendContinuationItemsAction"]["continuationItems"]
+
+    def fetchContinuationPage(self, innertubeContext: tuple, continuationToken: str):
+        """
+            The richGridRenderer items behind a continuation token, and the client context that got them
+        """
+        self.print(3, "Getting next page")
+        videoListPage = self.browse(
+            innertubeContext, continuationToken=continuationToken)
+        if videoListPage.status_code in (HTTPStatus.BAD_REQUEST, HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN):
+            #client context was rejected, refresh it and retry the page once
+            self.print(2, "Client context rejected, refreshing it")
+            innertubeContext = self.getInnertubeContext(
+                stale=innertubeContext) or innertubeContext
+            videoListPage = self.browse(
+                innertubeContext, continuationToken=continuationToken)
+        try:
+            with self.metrics.phase("parse"):
+                return innertubeContext, self.parseContinuationPage(videoListPage.content)
+        except Exception as e:
+            self.reportSiteFormatError("3.2", e, "Here is video list page log:\n\n{}".format(
+                self.get_request_log(videoListPage)))
+
+    #get all video data in formatted form, newest first
+    def iterVideos(self, channelID: str, checkpoint: _ChannelCheckpoint = None):
+        """
+            Yield the channel's videos page by page
+            Continuation pages are fetched in a loop and dropped once their videos are yielded
+            With a checkpoint every page is recorded in it before its videos are yielded, and a loaded one is picked up where it stopped
+        """
+        if checkpoint and checkpoint.pages:
+            self.print(
+                2, f"Resuming after video list {checkpoint.pages}, {len(checkpoint.videos)} videos were already fetched")
+            yield from checkpoint.videos
+            if not checkpoint.continuationToken:
+                self.print(2, "No more videos exist")
+                return
+            current = checkpoint.pages + 1
+            innertubeContext, videoList = self.fetchContinuationPage(
+                checkpoint.innertubeContext, checkpoint.continuationToken)
+        else:
+            current = 1
+            innertubeContext = self.getInnertubeContext()
+            videoList = self.browseFirstVideoPage(channelID, innertubeContext)
+            if videoList is None and innertubeContext is not None:
+                #the cached context might have gone stale, try once more with a fresh one
+                innertubeContext = self.getInnertubeContext(stale=innertubeContext)
+                videoList = self.browseFirstVideoPage(channelID, innertubeContext)
+            if videoList is None:
+                self.print(2, "Falling back to the channel's videos page")
+                innertubeContext, videoList = self.scrapeVideosPage(channelID)
+            self.print(2, "Gotten tokens")
+
+        while True:
+            self.print(2, f"Getting video list {current}")
+            try:
+                with self.metrics.phase("parse"):
+                    pageVideoData, continuationToken = self.parseVideoList(
+                        videoList)
+            except Exception as e:
+                self.reportSiteFormatError("3.1", e, "Video list:\n\n{}".format(
+                    json.dumps(videoList)))
+            self.metrics.countPage(channelID, len(pageVideoData))
+            if checkpoint:
+                checkpoint.record(pageVideoData, continuationToken, innertubeContext)
+            yield from pageVideoData
+            # if no more exists we're done
+            if not continuationToken:
+                self.print(2, "No more videos exist")
+                return
+            # ask for more videos
+            innertubeContext, videoList = self.fetchContinuationPage(
+                innertubeContext, continuationToken)
+            current += 1
+
+    def getVideos(self, channelID: str):
+        return list(self.iterVideos(channelID))
+
+    def writeChangelog(self, channelName: str, changes):
+        """
+            Append changes to the channel's changelog as they arrive, returns how many were written
+            SQLite keeps them in its video_history table instead, they are only reported there
+        """
+        changeCount = 0
+        sanitizedChannelName = str(sanitize_filename(channelName))
+        f = None
+        if self.databaseType != "sqlite":
+            f = open(
+                f"{self._ChangelogBaseFilesPath + sanitizedChannelName}.chagelog", 'a')
+        write = f.write if f else lambda text: None
+        try:
+            self.print(3, "Writing changelogs")
+            write(
+                f"Script run at {datetime.now()}\n===================================================\n")
+            for change in changes:
+                changeCount += 1
+                oldSubdata, newSubdata = change.old, change.new
+                if change.kind == "views":
+                    self.print(2,
+                               f"Views for video '{oldSubdata['Title']}' changed!")
+                    write(
+                        f"Views have changed :\n    Title: {oldSubdata['Title']}\n    Link: {newSubdata['Link']}\n    Old view count: {oldSubdata['Views']} \n    New view count: {newSubdata['Views']}\n")
+                elif change.kind == "duration":
+                    self.print(2,
+                               f"Duration for video '{oldSubdata['Title']}' has changed!")
+                    write(
+                        f"Duration for video changed:\n    Title: {oldSubdata['Title']}\n    Link: {newSubdata['Link']}\n    Old Duration: {oldSubdata['Duration']} \n    New Duration: {newSubdata['Duration']}\n")
+                elif change.kind == "title":
+                    self.print(2,
+                               f"Title for video '{oldSubdata['Title']}' has changed!")
+                    write(
+                        f"Title for video changed:\n    Old Title: {oldSubdata['Title']}\n    Link: {newSubdata['Link']}\n    New Title: {newSubdata['Title']} \n")
+                elif change.kind == "restored":
+                    self.print(2,
+                               f"Video '{oldSubdata['Title']}' is available again!")
+                    write(
+                        f"Available again:\n    Title: {newSubdata['Title']}\n    Link: {newSubdata['Link']}\n    Views: {newSubdata['Views']} \n    Duration: {newSubdata['Duration']}\n")
+                elif change.kind == "added":
+                    self.print(1, f"Newly added: '{newSubdata['Title']}'")
+                    write(
+                        f"Newly Added:\n    Title: {newSubdata['Title']}\n    Link: {newSubdata['Link']}\n    Views: {newSubdata['Views']} \n    Duration: {newSubdata['Duration']}\n")
+                elif change.kind == "removed":
+                    self.print(2,
+                               f"Video '{oldSubdata['Title']}' Has been removed or unlisted! Still keeping in data though")
+                    write(
+                        f"Removed or Unlisted:\n    Title: {oldSubdata['Title']}\n    Link: {oldSubdata['Link']}\n    Views: {oldSubdata['Views']} \n    Duration: {oldSubdata['Duration']}\n")
+            if not changeCount:
+                self.print(1, "No changes detected.")
+                write("No changes detected\n")
+        finally:
+            if f:
+                f.close()
+        return changeCount
+
+    def readStateFile(self, filePath: str):
+        try:
+            with open(filePath, 'r') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return {}
+        except json.decoder.JSONDecodeError:
+            self.print(1, f"{filePath} is corrupt, starting over without it")
+            return {}
+
+    def isFullScanDue(self, channelID: str):
+        lastFullScan = self.crawlState.get(channelID, {}).get("LastFullScan")
+        if lastFullScan is None:
+            return True
+        return (datetime.now() - datetime.fromisoformat(lastFullScan)).total_seconds() >= self.fullScanInterval * 86400
+
+    def markFullScan(self, channelID: str):
+        with self._databaseLock:
+            self.crawlState.setdefault(channelID, {})[
+                "LastFullScan"] = datetime.now().isoformat()
+            atomicWriteJson(self._CrawlStateFilePath, self.crawlState)
+
+    def schedulePoll(self, channelID: str, uploads: int = None):
+        """
+            Set when the daemon crawls the channel next from what this crawl found: the interval halves after new uploads
+            and grows by half after a crawl without any, within the min and max poll intervals. uploads is None for a first crawl
+        """
+        with self._databaseLock:
+            state = self.crawlState.setdefault(channelID, {})
+            interval = state.get("PollInterval", _InitialPollHours * 3600)
+            if uploads:
+                interval /= 2
+            elif uploads is not None:
+                interval *= 1.5
+            state["PollInterval"] = min(self.maxPollInterval, max(self.minPollInterval, interval))
+            state["LastCrawl"] = datetime.now().isoformat()
+            atomicWriteJson(self._CrawlStateFilePath, self.crawlState)
+
+    def nextPoll(self, channelID: str):
+        """
+            Seconds from now until the channel is due for a crawl, 0 or less if it already is
+        """
+        state = self.crawlState.get(channelID, {})
+        if "LastCrawl" not in state:
+            return 0
+        return state["PollInterval"] - (datetime.now() - datetime.fromisoformat(state["LastCrawl"])).total_seconds()
 
     # overrides changes if there are any, use when no initial file exists
     def getAndSaveVideos(self, channelName: str, channelID: str):
         videoData = self.getVideos(channelID)
-        self.writeBasicDataToDB(channelName, channelID, videoData)
+        with self._databaseLock:
+            self.writeBasicDataToDB(channelName, channelID, videoData)
         self.print(1, "Done!")
 
-    def detectAndSaveChanges(self, channelName: str, AppendNewData: bool = True):
+    def detectAndSaveChanges(self, channelName: str, AppendNewData: bool = True, keepCheckpoint: bool = True):
+        """
+            Crawl the channel and save what changed since the last crawl, returns the channel's ID or None if there is no such channel
+            keepCheckpoint leaves the pages of a crawl that fails for --resume, without it they are thrown away
+        """
         self.print(1, f"Checking {channelName}")
-        searchResults = self.searchForChannelName(channelName)
+        searchResults = self.resolveChannel(channelName)
         if not searchResults:
             self.print(1, "No channel by such name!")
-            return False
+            return None
         channelName, channelID = searchResults
         self.print(1, f"Found '{channelName}'")
-        olddata = self.readBasicDataFromDB(channelName, channelID)
+        stopAfterKnown = 0
+        if self.incrementalKnownRun and not self.isFullScanDue(channelID):
+            stopAfterKnown = self.incrementalKnownRun
+            self.print(
+                2, f"Incremental crawl, stopping after {stopAfterKnown} already indexed videos in a row")
+        self.print(1, "getting new data... be patient")
+        checkpoint = self.openCheckpoint(channelID)
+        try:
+            self.saveChanges(channelName, channelID, self.iterVideos(
+                channelID, checkpoint), AppendNewData, stopAfterKnown)
+        except Exception:
+            if not keepCheckpoint:
+                checkpoint.discard()
+            raise
+        checkpoint.discard()
+        return channelID
+
+    def saveChanges(self, channelName: str, channelID: str, newdata, AppendNewData: bool = True, stopAfterKnown: int = 0):
+        """
+            Diff freshly crawled videos against the database, write the changelog and save the merged data
+            newdata can be a generator, it is consumed page by page while changes are logged and merged
+            stopAfterKnown > 0 makes this an incremental crawl, see iterVideoChanges
+        """
+        with self._databaseLock, self.metrics.phase("database"):
+            olddata = self.readBasicDataFromDB(channelName, channelID)
         if olddata is None:
             self.print(1, "No previous data detected, indexing from scratch")
-            self.getAndSaveVideos(channelName, channelID)
+            newdata = list(newdata)
+            with self._databaseLock, self.metrics.phase("database"):
+                self.writeBasicDataToDB(channelName, channelID, newdata)
+            self.markFullScan(channelID)
+            self.schedulePoll(channelID)
+            self.print(1, "Done!")
             return True
-        self.print(1, "getting new data... be patient")
-        newdata = self.getVideos(channelID)
-        change = False
-        sanitizedChannelName = str(sanitize_filename(channelName))
-        with open(f"{self._ChangelogBaseFilesPath + sanitizedChannelName}.chagelog", 'a') as f:
-            self.print(3, "Writing changelogs")
-            f.write(
-                f"Script run at {datetime.now()}\n===================================================\n")
-            for newSubdata in newdata:
-                exists = False
-                for oldSubdata in olddata:
-                    if (newSubdata["Link"] == oldSubdata["Link"]):
-                        #check views:
-                        if oldSubdata["Views"] != newSubdata["Views"]:
-                            change = True
-                            self.print(2,
-                                       f"Views for video '{oldSubdata['Title']}' changed!")
-                            f.write(
-                                f"Views have changed :\n    Title: {oldSubdata['Title']}\n    Link: {newSubdata['Link']}\n    Old view count: {oldSubdata['Views']} \n    New view count: {newSubdata['Views']}\n")
-                        #check if Duration has changed
-                        if (oldSubdata["Duration"] != newSubdata["Duration"]):
-                            change = True
-                            self.print(2,
-                                       f"Duration for video '{oldSubdata['Title']}' has changed!")
-                            f.write(
-                                f"Duration for video changed:\n    Title: {oldSubdata['Title']}\n    Link: {newSubdata['Link']}\n    Old Duration: {oldSubdata['Duration']} \n    New Duration: {newSubdata['Duration']}\n")
-                        #check if Title has changed
-                        if (oldSubdata["Title"] != newSubdata["Title"]):
-                            change = True
-                            self.print(2,
-                                       f"Title for video '{oldSubdata['Title']}' has changed!")
-                            f.write(
-                                f"Title for video changed:\n    Old Title: {oldSubdata['Title']}\n    Link: {newSubdata['Link']}\n    New Title: {newSubdata['Title']} \n")
-                        exists = True
-                if not exists:
-                    change = True
-                    self.print(1, f"Newly added: '{newSubdata['Title']}'")
-                    f.write(
-                        f"Newly Added:\n    Title: {newSubdata['Title']}\n    Link: {newSubdata['Link']}\n    Views: {newSubdata['Views']} \n    Duration: {newSubdata['Duration']}\n")
-            for oldSubdata in olddata:
-                exists = False
-                for newSubdata in newdata:
-                    if (newSubdata["Link"] == oldSubdata["Link"]):
-                        exists = True
-                        break
-                oldSubdata["Availability"] = True
-                if not exists:
-                    change = True
-                    oldSubdata["Availability"] = False
-                    self.print(2,
-                               f"Video '{oldSubdata['Title']}' Has been removed or unlisted! Still keeping in data though")
-                    f.write(
-                        f"Removed or Unlisted:\n    Title: {oldSubdata['Title']}\n    Link: {oldSubdata['Link']}\n    Views: {oldSubdata['Views']} \n    Duration: {oldSubdata['Duration']}\n")
 
-            if not change:
-                self.print(1, "No changes detected.")
-                f.write("No changes detected\n")
-        if change:
-            #update olddata, then save to file
-            if AppendNewData:
-                self.print(1, "Appending changes..")
-                index = 0
-                for newSubdata in newdata:
-                    add = True
-                    for oldSubdata in olddata:
-                        if oldSubdata["Link"] == newSubdata["Link"]:
-                            oldSubdata["Title"] = newSubdata["Title"]
-                            oldSubdata["Views"] = newSubdata["Views"]
-                            oldSubdata["Duration"] = newSubdata["Duration"]
-                            add = False
-                            break
-                    if add:
-                        if index > len(olddata):
-                            index = len(olddata)
-                        # preserve by-date order
-                        olddata.insert(index, newSubdata)
-                    index += 1
-                self.writeBasicDataToDB(channelName, channelID, olddata)
+        changedVideos = []
+        history = []
+        crawlSeconds = 0
+        uploads = 0
+
+        def crawled():
+            #time spent waiting for newdata is crawling, not diffing
+            nonlocal crawlSeconds
+            videos = iter(newdata)
+            while True:
+                start = perf_counter()
+                try:
+                    video = next(videos)
+                except StopIteration:
+                    return
+                finally:
+                    crawlSeconds += perf_counter() - start
+                yield video
+
+        def streamedChanges():
+            nonlocal uploads
+            #each video's changes are logged before they are merged into olddata
+            for videoChanges in iterVideoChanges(olddata, crawled(), stopAfterKnown):
+                yield from videoChanges
+                if videoChanges[0].kind == "added":
+                    uploads += 1
+                if self.databaseType == "sqlite":
+                    history.extend(historyRecord(change)
+                                   for change in videoChanges)
+                if AppendNewData:
+                    mergeVideoChanges(olddata, videoChanges)
+                    change = videoChanges[0]
+                    changedVideos.append(
+                        change.new if change.kind == "added" else change.old)
+        diffStart = perf_counter()
+        changeCount = self.writeChangelog(channelName, streamedChanges())
+        self.metrics.addTime("diff", perf_counter() - diffStart - crawlSeconds)
+        if changeCount and AppendNewData:
+            #save the updated olddata
+            self.print(1, "Appending changes..")
+            with self._databaseLock, self.metrics.phase("database"):
+                self.storage.writeChanges(
+                    channelName, channelID, olddata, changedVideos, history)
+        elif history:
+            #still record what changed, only for videos that are already stored
+            with self._databaseLock, self.metrics.phase("database"):
+                self.storage.writeHistory(channelName, channelID, history)
+        if not stopAfterKnown:
+            self.markFullScan(channelID)
+        self.schedulePoll(channelID, uploads)
         self.print(1, "Done!")
         return True
 
+    def openCheckpoint(self, channelID: str):
+        """
+            The channel's page checkpoint, loaded if an earlier run left one behind
+        """
+        os.makedirs(self._CheckpointDirPath, exist_ok=True)
+        checkpoint = _ChannelCheckpoint(
+            path.join(self._CheckpointDirPath, f"{channelID}.jsonl"))
+        checkpoint.load()
+        return checkpoint
+
+    def startCrawlRun(self, channelNames: list, resume: bool = False):
+        """
+            Record the channels of a run in crawl_run.json and return the ones left to crawl
+            With resume the last run that didn't finish is picked up instead, its finished channels are skipped
+            and its failed ones tried again. Otherwise checkpoints left by that run are thrown away
+        """
+        lastRun = self.readStateFile(self._CrawlRunFilePath)
+        if resume and lastRun:
+            finished = set(lastRun["Finished"])
+            channelNames = [channelName for channelName in lastRun["Channels"]
+                            if channelName not in finished]
+            self.print(
+                1, f"Resuming the last run, {len(lastRun['Finished'])} of its {len(lastRun['Channels'])} channels are done")
+            self.crawlRun = {"Channels": lastRun["Channels"],
+                             "Finished": lastRun["Finished"], "Failed": {}}
+        else:
+            if resume:
+                self.print(1, "No unfinished run to resume, starting a new one")
+            shutil.rmtree(self._CheckpointDirPath, ignore_errors=True)
+            self.crawlRun = {"Channels": list(channelNames), "Finished": [], "Failed": {}}
+        atomicWriteJson(self._CrawlRunFilePath, self.crawlRun)
+        return channelNames
+
+    def finishChannel(self, channelName: str, error: Exception = None):
+        """
+            Mark a channel of the run as done, or as failed with error so later channels still run
+        """
+        with self._databaseLock:
+            if error is None:
+                self.metrics.add("channels_finished")
+                self.crawlRun["Finished"].append(channelName)
+            else:
+                self.metrics.add("channels_failed")
+                self.print(
+                    1, f"Skipping {channelName} after an error ({error}), use --resume to try it again")
+                self.crawlRun["Failed"][channelName] = str(error)
+            atomicWriteJson(self._CrawlRunFilePath, self.crawlRun)
+
+    def endCrawlRun(self):
+        """
+            Forget a run that finished every channel, keep crawl_run.json around for --resume otherwise
+        """
+        failed = self.crawlRun["Failed"]
+        if failed:
+            self.print(
+                1, f"{len(failed)} channel(s) failed: {', '.join(failed)}. run again with --resume to retry them")
+            return
+        os.remove(self._CrawlRunFilePath)
+        shutil.rmtree(self._CheckpointDirPath, ignore_errors=True)
+
+    def crawlChannel(self, channelName: str):
+        try:
+            self.detectAndSaveChanges(channelName)
+        except Exception as e:
+            self.finishChannel(channelName, e)
+        else:
+            self.finishChannel(channelName)
+
+    def crawlChannels(self, channelNames: list, resume: bool = False):
+        """
+            Run detectAndSaveChanges for every channel, concurrently when more than one worker is configured
+            Network requests overlap between workers while database writes stay serialized
+            A channel that fails is skipped and recorded, see startCrawlRun for resume
+        """
+        channelNames = self.startCrawlRun(channelNames, resume)
+        if self.workers == 1:
+            for channelName in channelNames:
+                self.crawlChannel(channelName)
+        else:
+            self.print(1, f"Crawling {len(channelNames)} channels with {self.workers} workers")
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self.crawlChannel, channelName)
+                           for channelName in channelNames]
+                for future in as_completed(futures):
+                    future.result()
+        self.endCrawlRun()
+
+    def runDaemon(self, channelNames: list, onCrawled=None):
+        """
+            Crawl the channels forever, each one when it is due (see schedulePoll), soonest first and up to self.workers at a time
+            The session, its consent cookies and client context are reused for every crawl. A failed crawl is tried again from scratch
+            after the min poll interval. onCrawled is called after each crawl, stop with Ctrl+C
+        """
+        #a later crawl sees newer pages than a checkpoint has, also drop the ones earlier runs left behind
+        shutil.rmtree(self._CheckpointDirPath, ignore_errors=True)
+        queue = []
+        for order, channelName in enumerate(channelNames):
+            cached = self.channelCache.get(channelName.strip().casefold())
+            due = monotonic() + self.nextPoll(cached["ChannelID"]) if cached else monotonic()
+            queue.append((due, order, channelName))
+        heapq.heapify(queue)
+        self.print(1, f"Polling {len(channelNames)} channels, every {self.minPollInterval / 3600:g} to {self.maxPollInterval / 3600:g} hours")
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while queue or running:
+                while queue and len(running) < self.workers and queue[0][0] <= monotonic():
+                    _, order, channelName = heapq.heappop(queue)
+                    running[executor.submit(self.detectAndSaveChanges, channelName, keepCheckpoint=False)] = (order, channelName)
+                timeout = max(0, queue[0][0] - monotonic()) if queue and len(running) < self.workers else None
+                if not running:
+                    self.print(2, f"Next crawl in {timeout:.0f}s")
+                    sleep(timeout)
+                    continue
+                done, _ = wait(running, timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    order, channelName = running.pop(future)
+                    try:
+                        channelID = future.result()
+                    except Exception as e:
+                        self.metrics.add("channels_failed")
+                        self.print(1, f"Crawling {channelName} failed ({e}), trying again in {self.minPollInterval / 3600:g} hours")
+                        delay = self.minPollInterval
+                    else:
+                        self.metrics.add("channels_finished")
+                        #names that aren't found wait the longest a channel can
+                        delay = self.nextPoll(channelID) if channelID else self.maxPollInterval
+                    heapq.heappush(queue, (monotonic() + delay, order, channelName))
+                    if onCrawled:
+                        onCrawled()
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    inputGroup = parser.add_mutually_exclusive_group(required=True)
+    inputGroup = parser.add_mutually_exclusive_group()
     inputGroup.add_argument(
-        "-c", "--creators", help="Creator names to index (use quatation marks for multi-worded names)", nargs='*')
+        "-c", "--creators", help="Creator names, @handles or channel IDs to index (use quatation marks for multi-worded names)", nargs='*')
     inputGroup.add_argument(
-        "-i", "--input-file", help="Input channel names from file (newline-separated names required)")
+        "-i", "--input-file", help="Input channel names, @handles or channel IDs from file (newline-separated names required)")
     parser.add_argument(
-        "-cts", "--convert-json-to-sqlite", help="Converts Json databases to SQLite format. Saves in the same location as json files", action='store_true')
+        "-cts", "--convert-json-to-sqlite", help="Converts Json databases to SQLite format. Saves in the same location as json files. converts every VE_ file in --location unless creators are given", action='store_true')
     parser.add_argument(
         '-f', "--format", help=f"Database storage format. defaults to SQLite", choices=_SupportedDatabases, default="sqlite")
     parser.add_argument(
@@ -509,7 +2012,39 @@ if __name__ == "__main__":
         '-ua', "--user-agent", help="User-Agent to use when connecting to YouTube", default="Mozilla/5.0 (Windows NT 6.1; rv:60.0) Gecko/20100101 Firefox/60.0")
     parser.add_argument(
         '-v', "--verbosity", help="Set verbosity from 0-4. (0 for silent, default is 1)", type=int, default=1)
+    parser.add_argument(
+        '-w', "--workers", help="Number of channels to crawl concurrently (default is 1)", type=int, default=1)
+    parser.add_argument(
+        "--rps", help="Global cap on requests per second sent to YouTube (0 for no limit, default). lowered automatically while YouTube throttles requests", type=float, default=0)
+    parser.add_argument(
+        "--retries", help="Times to retry a request that was throttled or failed, with exponential backoff (default is 5)", type=int, default=5)
+    parser.add_argument(
+        "--stats", help="Print how long each phase of the run took, requests sent, bytes downloaded, pages and videos per second", action='store_true')
+    parser.add_argument(
+        "--stats-json", help="Save the run's metrics to this Json file")
+    parser.add_argument(
+        "--prometheus-file", help="Save the run's metrics to this file in the Prometheus text format (for node_exporter's textfile collector)")
+    parser.add_argument(
+        "--daemon", help="Keep running and crawl each channel again when it is due. channels that upload often are crawled more often", action='store_true')
+    parser.add_argument(
+        "--min-poll", help="Fewest hours between two crawls of a channel in daemon mode (default is 1)", type=float, default=1)
+    parser.add_argument(
+        "--max-poll", help="Most hours between two crawls of a channel in daemon mode (default is 168)", type=float, default=168)
+    parser.add_argument(
+        "--resume", help="Continue the last run that didn't finish from the channel and page it stopped at, retrying channels that failed. -c/-i are only used if there is none", action='store_true')
+    parser.add_argument(
+        "--incremental", help="Stop crawling a channel after this many already indexed videos in a row. removals are then only detected by full crawls (0 to always crawl everything, default)", type=int, default=0)
+    parser.add_argument(
+        "--full-scan-every", help="Days between full crawls of a channel in incremental mode (default is 7)", type=float, default=7)
+    parser.add_argument(
+        "--channel-cache-ttl", help="Days to reuse a resolved channel ID before searching for it again (0 to always search, default is 30)", type=float, default=30)
+    parser.add_argument(
+        "--refresh-channels", help="Resolve all channel names again and update the channel cache", action='store_true')
+    parser.add_argument(
+        '-e', "--engine", help="Network engine. 'async' crawls all channels on one asyncio event loop and needs aiohttp. defaults to requests", choices={"requests", "async"}, default="requests")
     args = parser.parse_args()
+    if args.creators is None and args.input_file is None and not args.convert_json_to_sqlite and not args.resume:
+        parser.error("one of the arguments -c/--creators -i/--input-file is required")
 
     creators = []
     if args.creators:
@@ -522,11 +2057,31 @@ if __name__ == "__main__":
                 creators.append(line.strip())
 
     sample = Collector(args.format, args.location,
-                       args.user_agent, args.verbosity)
-    sleep(2)
-    if args.convert_json_to_sqlite:
-        for creator in creators:
-            sample.convertJSONtoSQLite(creator)
-    else:
-        for creator in creators:
-            sample.detectAndSaveChanges(creator)
+                       args.user_agent, args.verbosity, args.workers, args.rps,
+                       args.incremental, args.full_scan_every, args.channel_cache_ttl, args.refresh_channels, args.convert_json_to_sqlite,
+                       args.retries, args.min_poll, args.max_poll)
+
+    def saveMetrics():
+        if args.stats_json:
+            sample.metrics.writeJson(args.stats_json)
+        if args.prometheus_file:
+            sample.metrics.writePrometheus(args.prometheus_file)
+    try:
+        if args.convert_json_to_sqlite:
+            sample.convertJSONtoSQLite(creators)
+        else:
+            if sample.visitedHomepage:
+                sleep(2)
+            if args.daemon:
+                #keep exported metrics current while the daemon runs
+                sample.runDaemon(creators, saveMetrics)
+            elif args.engine == "async":
+                import asynccollector
+                asynccollector.crawlChannels(sample, creators, args.resume)
+            else:
+                sample.crawlChannels(creators, args.resume)
+    finally:
+        if args.stats:
+            print(sample.metrics.summary())
+        saveMetrics()
+        sample.close()
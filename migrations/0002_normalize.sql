@@ -0,0 +1,15 @@
+--Version 1 to 2: typed columns keyed by video id, an index on channel_id and the video_history table
+--video_id, parse_views and parse_duration are SQL functions registered by collector.py before this runs
+BEGIN;
+CREATE TABLE video ( video_key INTEGER PRIMARY KEY, video_id TEXT UNIQUE NOT NULL, channel_id TEXT NOT NULL, video_title TEXT NOT NULL, video_views INTEGER, video_duration INTEGER, video_availability INTEGER NOT NULL, first_seen TEXT NOT NULL, last_changed TEXT NOT NULL, FOREIGN KEY (channel_id) REFERENCES channel (channel_id) ON UPDATE CASCADE ON DELETE CASCADE );
+CREATE INDEX video_channel_id ON video (channel_id);
+CREATE TABLE video_history ( history_key INTEGER PRIMARY KEY, video_key INTEGER NOT NULL, changed_at TEXT NOT NULL, change TEXT NOT NULL, old_value, new_value, FOREIGN KEY (video_key) REFERENCES video (video_key) ON DELETE CASCADE );
+CREATE INDEX video_history_video_key ON video_history (video_key);
+CREATE INDEX video_history_changed_at ON video_history (changed_at);
+--version 1 rows are newest first, copy them oldest first so video_key keeps growing with upload order
+INSERT INTO video (video_id, channel_id, video_title, video_views, video_duration, video_availability, first_seen, last_changed)
+    SELECT video_id(video_link), channel_id, video_title, parse_views(video_views), parse_duration(video_duration), video_availability, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+    FROM basic_video_data ORDER BY rowid DESC;
+DROP TABLE basic_video_data;
+PRAGMA user_version = 2;
+COMMIT;
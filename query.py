@@ -0,0 +1,309 @@
+#filtered reads and exports over the SQLite index collector.py builds, without loading whole channels
+#run from the repository root: python3 query.py changes --kind removed --since 2026-10-01 -o removed.csv
+#Parquet exports need pyarrow (pip install pyarrow), CSV and JSON Lines don't
+import argparse
+import csv
+import io
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+from os import path
+
+from collector import dumpJsonLine, _ScriptPath, _VideoLinkPrefix
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+_Formats = {"csv", "jsonl", "parquet"}
+#rows pulled from SQLite per fetchmany call, and per Parquet row group
+_BatchSize = 5000
+_VideoColumns = ("channel_id", "channel_name", "video_id", "link", "title",
+                 "views", "duration", "available", "first_seen", "last_changed")
+_VideoOrders = {"newest": "video.video_key DESC", "oldest": "video.video_key ASC", "views": "video.video_views DESC",
+                "changed": "video.last_changed DESC"}
+_Changes = {"views", "duration", "title", "restored", "added", "removed"}
+
+
+def connect(databaseFilePath: str):
+    """
+        Read-only connection to all_data.sqlite, so a running collector is never blocked or changed by a query
+    """
+    if not path.exists(databaseFilePath):
+        raise FileNotFoundError(f"No SQLite database at {databaseFilePath}")
+    conn = sqlite3.connect(f"file:{databaseFilePath}?mode=ro", uri=True)
+    conn.create_function("video_link", 1, lambda videoID: _VideoLinkPrefix + videoID, deterministic=True)
+    return conn
+
+
+def timestamp(value: str):
+    """
+        A date or ISO time (UTC unless it has an offset) as the 'YYYY-MM-DD HH:MM:SS' UTC text SQLite's CURRENT_TIMESTAMP stores
+        "7d" and "12h" are that long ago
+    """
+    if value is None:
+        return None
+    if value[:-1].isdigit() and value[-1] in "dh":
+        delta = timedelta(days=int(value[:-1])) if value[-1] == "d" else timedelta(hours=int(value[:-1]))
+        moment = datetime.now(timezone.utc) - delta
+    else:
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def channelFilter(channels: list, conditions: list, parameters: list):
+    #channels can be given by name or ID
+    if channels:
+        placeholders = ", ".join("?" * len(channels))
+        conditions.append(f"(channel.channel_id IN ({placeholders}) OR channel.channel_name IN ({placeholders}))")
+        parameters.extend(channels)
+        parameters.extend(channels)
+
+
+def pagination(limit: int, offset: int, parameters: list):
+    if limit is None and not offset:
+        return ""
+    parameters.extend((-1 if limit is None else limit, offset or 0))
+    return " LIMIT ? OFFSET ?"
+
+
+def videosQuery(channels: list = None, available: bool = None, since: str = None, until: str = None, minViews: int = None,
+                maxViews: int = None, orderBy: str = "newest", limit: int = None, offset: int = 0):
+    """
+        SQL and parameters for stored videos. since and until bound when a video was first seen
+    """
+    conditions = []
+    parameters = []
+    channelFilter(channels, conditions, parameters)
+    if available is not None:
+        conditions.append("video.video_availability = ?")
+        parameters.append(int(available))
+    if since:
+        conditions.append("video.first_seen >= ?")
+        parameters.append(timestamp(since))
+    if until:
+        conditions.append("video.first_seen < ?")
+        parameters.append(timestamp(until))
+    if minViews is not None:
+        conditions.append("video.video_views >= ?")
+        parameters.append(minViews)
+    if maxViews is not None:
+        conditions.append("video.video_views <= ?")
+        parameters.append(maxViews)
+    sql = ("SELECT channel.channel_id, channel.channel_name, video.video_id, video_link(video.video_id), video.video_title, video.video_views, "
+           "video.video_duration, video.video_availability, video.first_seen, video.last_changed "
+           "FROM video JOIN channel ON channel.channel_id = video.channel_id")
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {_VideoOrders[orderBy]}"
+    sql += pagination(limit, offset, parameters)
+    return _VideoColumns, sql, parameters
+
+
+def changesQuery(channels: list = None, kinds: list = None, since: str = None, until: str = None, limit: int = None, offset: int = 0):
+    """
+        SQL and parameters for video_history rows, newest first. since and until bound when the change was detected
+    """
+    conditions = []
+    parameters = []
+    channelFilter(channels, conditions, parameters)
+    if kinds:
+        conditions.append(f"video_history.change IN ({', '.join('?' * len(kinds))})")
+        parameters.extend(kinds)
+    if since:
+        conditions.append("video_history.changed_at >= ?")
+        parameters.append(timestamp(since))
+    if until:
+        conditions.append("video_history.changed_at < ?")
+        parameters.append(timestamp(until))
+    sql = ("SELECT video_history.changed_at, video_history.change, video_history.old_value, video_history.new_value, "
+           "channel.channel_id, channel.channel_name, video.video_id, video_link(video.video_id), video.video_title "
+           "FROM video_history JOIN video ON video.video_key = video_history.video_key JOIN channel ON channel.channel_id = video.channel_id")
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY video_history.changed_at DESC, video_history.history_key DESC"
+    sql += pagination(limit, offset, parameters)
+    return ("changed_at", "change", "old_value", "new_value", "channel_id", "channel_name", "video_id", "link", "title"), sql, parameters
+
+
+def gainersQuery(channels: list = None, since: str = None, until: str = None, limit: int = 10, offset: int = 0):
+    """
+        SQL and parameters for the videos that gained the most views between since and until, from their views history rows
+    """
+    conditions = ["video_history.change = 'views'"]
+    parameters = []
+    if since:
+        conditions.append("video_history.changed_at >= ?")
+        parameters.append(timestamp(since))
+    if until:
+        conditions.append("video_history.changed_at < ?")
+        parameters.append(timestamp(until))
+    channelConditions = []
+    channelFilter(channels, channelConditions, parameters)
+    #the gain is the last count seen minus the first one, YouTube lowers counts after view audits so MAX - MIN would overstate it
+    sql = ("SELECT channel.channel_id, channel.channel_name, video.video_id, video_link(video.video_id), video.video_title, "
+           "gains.views_before, gains.views_after, gains.views_after - gains.views_before AS gain FROM "
+           "(SELECT DISTINCT video_key, "
+           "FIRST_VALUE(old_value) OVER (PARTITION BY video_key ORDER BY changed_at, history_key) AS views_before, "
+           "FIRST_VALUE(new_value) OVER (PARTITION BY video_key ORDER BY changed_at DESC, history_key DESC) AS views_after "
+           f"FROM video_history WHERE {' AND '.join(conditions)}) AS gains "
+           "JOIN video ON video.video_key = gains.video_key JOIN channel ON channel.channel_id = video.channel_id")
+    if channelConditions:
+        sql += " WHERE " + " AND ".join(channelConditions)
+    sql += " ORDER BY gain DESC"
+    sql += pagination(limit, offset, parameters)
+    return ("channel_id", "channel_name", "video_id", "link", "title", "views_before", "views_after", "gain"), sql, parameters
+
+
+def iterRows(conn: sqlite3.Connection, sql: str, parameters: list, batchSize: int = _BatchSize):
+    """
+        Yield batches of result rows as SQLite steps through them, at most batchSize rows are in memory at a time
+    """
+    cursor = conn.execute(sql, parameters)
+    try:
+        while True:
+            rows = cursor.fetchmany(batchSize)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+
+def writeCsv(batches, columns: tuple, output):
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    count = 0
+    for rows in batches:
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+
+def writeJsonLines(batches, columns: tuple, output):
+    count = 0
+    for rows in batches:
+        output.write(b"".join(dumpJsonLine(dict(zip(columns, row))) for row in rows))
+        count += len(rows)
+    return count
+
+
+def writeParquet(batches, columns: tuple, output):
+    """
+        One row group per batch. Column types come from the first batch, so columns that start out NULL in every row
+        of it (old_value/new_value of added videos for example) are stored as text
+    """
+    if pyarrow is None:
+        raise ImportError(
+            "Parquet exports need pyarrow, install it with 'pip install pyarrow'")
+    writer = None
+    count = 0
+    try:
+        for rows in batches:
+            table = pyarrow.Table.from_pylist([dict(zip(columns, row)) for row in rows], schema=writer.schema if writer else None)
+            if writer is None:
+                schema = pyarrow.schema([field if not pyarrow.types.is_null(field.type) else pyarrow.field(field.name, pyarrow.string())
+                                         for field in table.schema])
+                table = table.cast(schema)
+                writer = pyarrow.parquet.ParquetWriter(output, schema)
+            writer.write_table(table)
+            count += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def export(conn: sqlite3.Connection, query: tuple, format: str, output):
+    """
+        Stream the rows of a (columns, sql, parameters) query to output, a binary file. Returns how many rows were written
+    """
+    columns, sql, parameters = query
+    batches = iterRows(conn, sql, parameters)
+    if format == "csv":
+        text = io.TextIOWrapper(output, encoding="utf-8", newline='')
+        try:
+            return writeCsv(batches, columns, text)
+        finally:
+            #hand output back to the caller open
+            text.flush()
+            text.detach()
+    if format == "jsonl":
+        return writeJsonLines(batches, columns, output)
+    return writeParquet(batches, columns, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def addCommonArguments(command: argparse.ArgumentParser, defaultLimit: int = None):
+        command.add_argument(
+            '-l', "--location", help="Database location relative to script's path", default=_ScriptPath)
+        command.add_argument(
+            '-f', "--format", help="Export format. defaults to the output file's extension, or csv", choices=_Formats)
+        command.add_argument(
+            '-o', "--output", help="File to export to (default is standard output)")
+        command.add_argument(
+            '-c', "--channels", help="Only these channels, by name or ID", nargs='*')
+        command.add_argument(
+            "--since", help="From this UTC date or time (YYYY-MM-DD[THH:MM]), or this long ago like 7d or 12h")
+        command.add_argument(
+            "--until", help="Before this date or time, same format as --since")
+        command.add_argument(
+            "--limit", help="Most rows to return" + (f" (default is {defaultLimit})" if defaultLimit else ""), type=int, default=defaultLimit)
+        command.add_argument(
+            "--offset", help="Rows to skip, for paging through results with --limit", type=int, default=0)
+
+    videosCommand = commands.add_parser(
+        "videos", help="Stored videos. --since/--until bound when they were first seen")
+    addCommonArguments(videosCommand)
+    availability = videosCommand.add_mutually_exclusive_group()
+    availability.add_argument(
+        "--available", help="Only videos that are up", dest="available", action='store_true', default=None)
+    availability.add_argument(
+        "--removed", help="Only removed or unlisted videos", dest="available", action='store_false')
+    videosCommand.add_argument(
+        "--min-views", help="Only videos with at least this many views", type=int)
+    videosCommand.add_argument(
+        "--max-views", help="Only videos with at most this many views", type=int)
+    videosCommand.add_argument(
+        "--order", help="Sort order (default is newest)", choices=_VideoOrders, default="newest")
+    changesCommand = commands.add_parser(
+        "changes", help="Detected changes, newest first. --since/--until bound when they were detected")
+    addCommonArguments(changesCommand)
+    changesCommand.add_argument(
+        '-k', "--kind", help="Only these kinds of changes", nargs='*', choices=_Changes)
+    gainersCommand = commands.add_parser(
+        "gainers", help="Videos that gained the most views between --since and --until")
+    addCommonArguments(gainersCommand, 10)
+    args = parser.parse_args()
+
+    if args.command == "videos":
+        query = videosQuery(args.channels, args.available, args.since, args.until,
+                            args.min_views, args.max_views, args.order, args.limit, args.offset)
+    elif args.command == "changes":
+        query = changesQuery(args.channels, args.kind, args.since, args.until, args.limit, args.offset)
+    else:
+        query = gainersQuery(args.channels, args.since, args.until, args.limit, args.offset)
+    format = args.format
+    if format is None:
+        extension = path.splitext(args.output or "")[1][1:]
+        format = extension if extension in _Formats else "csv"
+    if format == "parquet" and pyarrow is None:
+        #before the output file is created, so a failed export doesn't leave an empty one behind
+        parser.error("Parquet exports need pyarrow, install it with 'pip install pyarrow'")
+    conn = connect(path.join(args.location, "all_data.sqlite"))
+    try:
+        if args.output:
+            with open(args.output, 'wb') as output:
+                count = export(conn, query, format, output)
+        else:
+            count = export(conn, query, format, sys.stdout.buffer)
+    finally:
+        conn.close()
+    print(f"Exported {count} rows", file=sys.stderr)
@@ -1,6 +1,15 @@
---Schematic for Sqlite database
+--Schematic for Sqlite database, version 2 (see migrations/ for upgrading older databases)
 --Foreign key constraint enforcement;
 PRAGMA FOREIGN_KEYS = on;
 --Assuming channel id's are constant and unique;
 CREATE TABLE IF NOT EXISTS channel ( channel_id TEXT UNIQUE NOT NULL, channel_name TEXT NOT NULL );
-CREATE TABLE IF NOT EXISTS basic_video_data (video_title TEXT NOT NULL,  video_link TEXT UNIQUE NOT NULL, video_views TEXT, video_duration TEXT, video_availability INTEGER NOT NULL, channel_id TEXT NOT NULL, FOREIGN KEY (channel_id) REFERENCES channel (channel_id) ON UPDATE CASCADE ON DELETE CASCADE );
\ No newline at end of file
+--videos are keyed by YouTube's 11 character video id, views and duration (in seconds) are NULL when YouTube doesn't show them
+--video_key grows with upload order as far as the crawler can tell, newest first is ORDER BY video_key DESC
+CREATE TABLE IF NOT EXISTS video ( video_key INTEGER PRIMARY KEY, video_id TEXT UNIQUE NOT NULL, channel_id TEXT NOT NULL, video_title TEXT NOT NULL, video_views INTEGER, video_duration INTEGER, video_availability INTEGER NOT NULL, first_seen TEXT NOT NULL, last_changed TEXT NOT NULL, FOREIGN KEY (channel_id) REFERENCES channel (channel_id) ON UPDATE CASCADE ON DELETE CASCADE );
+CREATE INDEX IF NOT EXISTS video_channel_id ON video (channel_id);
+--append-only log of every detected change, replaces the .chagelog files for SQLite databases
+--change is one of views, duration, title, restored, added, removed
+CREATE TABLE IF NOT EXISTS video_history ( history_key INTEGER PRIMARY KEY, video_key INTEGER NOT NULL, changed_at TEXT NOT NULL, change TEXT NOT NULL, old_value, new_value, FOREIGN KEY (video_key) REFERENCES video (video_key) ON DELETE CASCADE );
+CREATE INDEX IF NOT EXISTS video_history_video_key ON video_history (video_key);
+CREATE INDEX IF NOT EXISTS video_history_changed_at ON video_history (changed_at);
+PRAGMA user_version = 2;